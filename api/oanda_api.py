@@ -1,12 +1,30 @@
 import requests
 import constants
+import numpy as np
 import pandas as pd
-from dateutil import parser
+import random
+import time
+from requests.adapters import HTTPAdapter
 from datetime import datetime as dt
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RETRY_CODES = [429, 500, 502, 503, 504]
+PRICE_CODES = {'mid': 'M', 'bid': 'B', 'ask': 'A'}
+
 class OandaApi:
-    def __init__(self):
+    def __init__(self, base_url=None, pool_size=10, rate_limiter=None, max_retries=0, backoff_base=0.5):
+        self.base_url = base_url if base_url is not None else constants.OANDA_URL
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update(
             {
                 "Authorization": f"Bearer {constants.API_KEY}",
@@ -14,20 +32,36 @@ class OandaApi:
             }
         )
 
+    def parse_json(self, response):
+        return orjson.loads(response.content) if orjson is not None else response.json()
+
     def make_request(self, url, verb='get', code=200, params=None, data=None, headers=None):
-        full_url = f"{constants.OANDA_URL}/{url}"
-        try:
-            response = None
-            if verb == 'get':
-                response = self.session.get(full_url, params=params, data=data, headers=headers)
-            if response == None:
-                raise Exception('Response was none')
-            if response.status_code == code:
-                return True, response.json()
-            else:
-                return False, response.json()
-        except Exception as ex:
-            return False, {'Exception': ex}
+        full_url = f"{self.base_url}/{url}"
+        attempt = 0
+        while True:
+            retry = False
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                response = None
+                if verb == 'get':
+                    response = self.session.get(full_url, params=params, data=data, headers=headers)
+                if response == None:
+                    raise Exception('Response was none')
+                if response.status_code == code:
+                    return True, self.parse_json(response)
+                retry = response.status_code in RETRY_CODES
+                result = False, self.parse_json(response)
+            except Exception as ex:
+                retry = retry or isinstance(ex, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+                result = False, {'Exception': ex}
+
+            if not retry or attempt >= self.max_retries:
+                return result
+
+            # exponential backoff with jitter before the next attempt
+            time.sleep(self.backoff_base * (2 ** attempt) * (1 + random.random()))
+            attempt += 1
         
     def get_account_ep(self, ep, data_key):
         url = f"accounts/{constants.ACCOUNT_ID}/{ep}"
@@ -65,21 +99,37 @@ class OandaApi:
             print('*** ERROR fetch_candles()', params, data)
             return None
         
-    def get_candles_df(self, pair_name, **kwargs):
+    def get_candles_df(self, pair_name, components=None, **kwargs):
+        """
+        components limits the price components parsed (and requested, unless price is given),
+        e.g. components=['mid'] only asks oanda for mid prices.
+        Returns None when the request failed, an empty dataframe when there were no candles.
+        """
+        if components is not None and 'price' not in kwargs:
+            kwargs['price'] = ''.join(PRICE_CODES[p] for p in components)
         data = self.fetch_candles(pair_name, **kwargs)
+        if data is None:
+            return None
+        return self.candles_to_df(data, components)
+
+    def candles_to_df(self, data, components=None):
         if data is None or len(data) == 0:
             return pd.DataFrame()
-        prices = ['mid', 'bid', 'ask']
+        data = [candle for candle in data if candle['complete']]
+        if len(data) == 0:
+            return pd.DataFrame()
+
+        prices = ['mid', 'bid', 'ask'] if components is None else components
         ohlc = ['o', 'h', 'l', 'c']
-        final_data = []
-        for candle in data:
-            if not candle['complete']:
+        columns = {
+            'time': pd.to_datetime([candle['time'] for candle in data], format='ISO8601', utc=True),
+            'volume': np.array([candle['volume'] for candle in data], dtype=np.int64)
+        }
+        for p in prices:
+            if p not in data[0]:
                 continue
-            new_dict = {'time': parser.parse(candle['time']), 'volume': candle['volume']}
-            for p in prices:
-                if p in candle:
-                    for o in ohlc:
-                        new_dict[f"{p}_{o}"] = float(candle[p][o])
-            final_data.append(new_dict)
-        df = pd.DataFrame.from_dict(final_data)
-        return df
\ No newline at end of file
+            values = [candle[p] for candle in data]
+            for o in ohlc:
+                # oanda sends prices as strings, numpy converts the whole column at once
+                columns[f"{p}_{o}"] = np.array([v[o] for v in values], dtype=np.float64)
+        return pd.DataFrame(columns)
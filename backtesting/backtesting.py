@@ -1,51 +1,142 @@
 from infrastructure.instrument_collection import InstrumentCollection
 from infrastructure import trade_simulation
+from infrastructure import candle_store
+from infrastructure import candle_arrays
+from infrastructure import resample
+from infrastructure import technicals_cache
+from infrastructure import schema
+from backtesting import engine
+from backtesting import fills
 from technicals import trend
 from technicals import zone
 from technicals import pattern
 from technicals import bottom
 from technicals import candle
-import datetime as dt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import time
 import pandas as pd
 from tqdm import tqdm
-import psutil
 
-def run_wirly_dirly_test(pairs, granularities, ic: InstrumentCollection, from_date=None, to_date=None):
+DEFAULT_CONFIG = {
+    "sl_pips": 0,
+    "tp_to_sl_ratio": 0.5,
+    "bottom_zone_lookback": 60,
+    "bottom_to_confirmation_spacing": 6,
+    "confirmation_wick_ratio": 0.7,
+    "exit_threshold": 55,
+    "reentry_to_confirm_max_space": 15
+}
+
+# columns apply_technicals adds, bump TECHNICALS_VERSION when any of them changes so old cache entries miss
+TECHNICAL_COLUMNS = ['ma_10', 'ma_50', 'ma_100', 'ma_150', 'in_downtrend', 'is_bottom', 'strong_bullish']
+TECHNICALS_VERSION = 2
+
+def run_wirly_dirly_test(pairs, granularities, ic: InstrumentCollection, from_date=None, to_date=None, workers=None):
     ic.load_instruments("./data")
 
-    config = {
-        "sl_pips": 0,
-        "tp_to_sl_ratio": 0.5,
-        "bottom_zone_lookback": 60,
-        "bottom_to_confirmation_spacing": 6,
-        "confirmation_wick_ratio": 0.7,
-        "exit_threshold": 55,
-        "reentry_to_confirm_max_space": 15
-    }
+    config = dict(DEFAULT_CONFIG)
     
     from_date = "2020-01-01T00:00:00Z"
     to_date = "2025-01-01T00:00:00Z"
 
-    for p in pairs:
-        for g in granularities:
-            analyze_pair(p, g, config, from_date, to_date)
+    return run_parallel(pairs, granularities, config, from_date, to_date, workers)
 
-def analyze_pair(pair, granularity, config, from_date=None, to_date=None):
-    print(f"Analyzing {pair} for {granularity}...")
-    df = pd.read_pickle(f"./data/{pair}_{granularity}.pkl")
-    if from_date is not None and to_date is not None:
-        df = filter_df_by_date(df, from_date, to_date)
-    apply_technicals(df, pair)
+def run_parallel(pairs, granularities, config, from_date=None, to_date=None, workers=None, price_dtype=None, fill_config=None,
+                 slim=False):
+    """
+    Runs analyze_pair for every (pair, granularity) job, each in its own worker process.
+    workers caps the number of concurrent processes (None = all cores, 1 = run in this process).
+    price_dtype, fill_config and slim are passed on to analyze_pair.
+    Returns a summary DataFrame with one row per job.
+    """
+    jobs = [(p, g) for p in pairs for g in granularities]
+    if len(jobs) == 0:
+        print('no jobs to run')
+        return pd.DataFrame(columns=['pair', 'granularity', 'rows', 'trades', 'status', 'seconds'])
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    start = time.perf_counter()
+    results = []
 
-    pip_divisor = 100 if 'JPY' in pair else 10000
-    sl_tp_pips = config['sl_pips'] / pip_divisor
-    exit_threshold_pips = config['exit_threshold'] / pip_divisor
+    def report(result):
+        print(f"{result['pair']} {result['granularity']} --> {result['status']} in {result['seconds']}s")
+        results.append(result)
+
+    if workers <= 1:
+        for p, g in jobs:
+            report(run_job(p, g, config, from_date, to_date, price_dtype, fill_config, slim))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_job, p, g, config, from_date, to_date, price_dtype, fill_config, slim) for p, g in jobs]
+            for future in as_completed(futures):
+                report(future.result())
+
+    wall_time = time.perf_counter() - start
+    summary = pd.DataFrame(results).sort_values(by=['pair', 'granularity']).reset_index(drop=True)
+    print(summary.to_string(index=False))
+    print(f"{len(jobs)} jobs on {workers} worker(s): {round(wall_time, 2)}s wall, {round(summary['seconds'].sum(), 2)}s total job time")
+    return summary
+
+def run_job(pair, granularity, config, from_date=None, to_date=None, price_dtype=None, fill_config=None, slim=False):
+    """
+    Worker entry point: analyzes one (pair, granularity) and returns its timing and trade count.
+    """
+    start = time.perf_counter()
+    result = dict(pair=pair, granularity=granularity, rows=0, trades=0, status='ok')
+    try:
+        df, ledger = analyze_pair(pair, granularity, config, from_date, to_date, price_dtype, fill_config=fill_config, slim=slim)
+        result['rows'] = len(df)
+        # from the ledger, a trade stopped out on its entry candle is never marked 'opened' in df
+        result['trades'] = len(ledger)
+    except Exception as ex:
+        result['status'] = f"error: {ex}"
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+def analyze_pair(pair, granularity, config, from_date=None, to_date=None, price_dtype=None, save_frame=True, fill_config=None,
+                 slim=False):
+    """
+    Loads candles, applies technicals and the state machine, and pickles the trade ledger
+    (with its summary in attrs) plus, when save_frame, the full annotated frame. slim saves
+    only the columns the charts read instead (schema.slim_frame). Returns (full frame, ledger).
+    price_dtype='float32' halves the price columns of the candles and results (see schema).
+    fill_config reprices the ledger on bid/ask (see fills.apply_fills); the frame keeps mid results.
+    """
+    print(f"Analyzing {pair} for {granularity}...")
+    df = load_pair(pair, granularity, from_date, to_date)
+    if price_dtype is not None:
+        schema.compact_candles(df, price_dtype)
+    apply_technicals(df, pair, config)
 
     if df is None:
         raise ValueError("DataFrame is None — make sure it's loaded and returned correctly before this point.")
     if df.empty:
         raise ValueError("Filtered DataFrame is empty — check your date range or data source.")
 
+    ledger = engine.run_state_machine(df, pair, config)
+    if fill_config is not None:
+        ledger = fills.apply_fills(ledger, fills.get_arrays(df), pair, fill_config, engine.get_times(df))
+        ledger.attrs['summary'] = engine.summarize_ledger(ledger)
+    if price_dtype is not None:
+        schema.compact_results(df, price_dtype)
+
+    df.reset_index(inplace=True)
+    ledger.to_pickle(f"./backtesting/results/{pair}_{granularity}_trades.pkl")
+    if save_frame:
+        frame = schema.slim_frame(df) if slim else df
+        frame.to_pickle(f"./backtesting/results/{pair}_{granularity}_analyzed.pkl")
+    print(f"{pair} analysis complete: {ledger.attrs['summary']}")
+    return df, ledger
+
+def run_state_machine_loop(df, pair, config):
+    """
+    Row-by-row reference implementation of the state machine in engine.py.
+    Expects df to have a RangeIndex; kept for parity checks against the engine.
+    """
+    pip_divisor = 100 if 'JPY' in pair else 10000
+    sl_tp_pips = config['sl_pips'] / pip_divisor
+    exit_threshold_pips = config['exit_threshold'] / pip_divisor
+
     df['trade'] = None
     df['entry_price'] = None
     df['stop_loss'] = None
@@ -184,22 +275,80 @@ def analyze_pair(pair, granularity, config, from_date=None, to_date=None):
                         active_trade['stop_loss'] = new_stop
                         df.loc[i, 'stop_loss'] = new_stop
 
-            
 
-    df.reset_index(inplace=True)
-    df.to_pickle(f"./backtesting/results/{pair}_{granularity}_analyzed.pkl")
-    print(f"{pair} analysis complete.")
+
+def check_engine_parity(df, pair, config):
+    """
+    Runs both the row loop and the compiled engine on copies of a technicals-applied df
+    and returns the list of result columns that differ (empty list == identical).
+    """
+    loop_df = df.reset_index(drop=True)
+    engine_df = loop_df.copy()
+    run_state_machine_loop(loop_df, pair, config)
+    engine.run_state_machine(engine_df, pair, config)
+
+    mismatched = []
+    for col in ['stage', 'trade'] + engine.RESULT_COLUMNS + engine.EXTRA_COLUMNS:
+        if col not in loop_df.columns:
+            # the loop only creates these columns once a trade has been opened
+            if engine_df[col].notna().any():
+                mismatched.append(col)
+            continue
+        expected = loop_df[col].to_numpy(dtype=object)
+        actual = engine_df[col].to_numpy(dtype=object)
+        expected_na = pd.isna(expected)
+        actual_na = pd.isna(actual)
+        if not (expected_na == actual_na).all() or not (expected[~expected_na] == actual[~actual_na]).all():
+            mismatched.append(col)
+    return mismatched
+
+def load_pair(pair, granularity, from_date=None, to_date=None):
+    # prefer the memory mapped arrays, the parquet store, resampling the stored M5 series, then the old per-file pickles
+    if candle_arrays.has_arrays(pair, granularity):
+        if candle_arrays.is_current(pair, granularity):
+            return candle_arrays.read_candles(pair, granularity, from_date, to_date)
+        print(f"{pair} {granularity} arrays are older than the candle store, reading the store (rerun candle_arrays.convert_store)")
+    if candle_store.has_candles(pair, granularity):
+        return candle_store.read_candles(pair, granularity, from_date, to_date)
+    if resample.has_base(pair) and resample.get_minutes(granularity) > resample.get_minutes(resample.BASE_GRANULARITY):
+        return resample.get_candles(pair, granularity, from_date, to_date)
+
+    df = pd.read_pickle(f"./data/{pair}_{granularity}.pkl")
+    if from_date is not None and to_date is not None:
+        df = filter_df_by_date(df, from_date, to_date)
+    return df
 
 def filter_df_by_date(df, start, end):
     start = pd.to_datetime(start)
     end = pd.to_datetime(end)
     return df[(df['time'] >= start) & (df['time'] <= end)].reset_index(drop=True)
 
-def apply_technicals(df, pair):
+def apply_technicals(df, pair, config=None, cache=True):
+    """
+    Adds TECHNICAL_COLUMNS to df in place (dropping the moving average warm-up rows).
+    With cache the columns are memoized on disk, keyed by the candles and the indicator parameters.
+    """
+    config = DEFAULT_CONFIG if config is None else config
+
+    if cache:
+        params = dict(
+            version=TECHNICALS_VERSION,
+            bottom_zone_lookback=config['bottom_zone_lookback'],
+            confirmation_wick_ratio=config['confirmation_wick_ratio']
+        )
+        key = technicals_cache.get_key(df, params)
+        cached = technicals_cache.load(key)
+        if cached is not None:
+            df.drop(index=df.index.difference(cached.index), inplace=True)
+            for col in TECHNICAL_COLUMNS:
+                df[col] = cached[col]
+            return
 
-    df['sTime'] = [dt.datetime.strftime(x, "s%y-%m-%d %H:%M") for x in df.time]
     trend.apply_downtrend(df)
-    bottom.apply_bottom_zones(df)
+    bottom.apply_bottom_zones(df, rolling_window=config['bottom_zone_lookback'])
     # zone.apply_zone_exits_and_reentries(df, 50, pair)
-    candle.detect_strong_bullish(df)
+    candle.detect_strong_bullish(df, wick_ratio_thresh=config['confirmation_wick_ratio'])
     # candle.mark_confirmations(df)
+
+    if cache:
+        technicals_cache.save(key, df[TECHNICAL_COLUMNS])
@@ -0,0 +1,150 @@
+from backtesting import backtesting
+from backtesting import engine
+from backtesting import metrics
+from infrastructure import candle_store
+from infrastructure import synthetic
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import psutil
+
+BENCHMARK_PATH = "./data/benchmarks"
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000, 5_000_000]
+
+class PeakMemory:
+    """
+    Samples this process' RSS on a background thread while the block runs, so the peak of
+    each stage can be reported separately (ru_maxrss only gives the lifetime peak).
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self.running = False
+
+    def _sample(self):
+        while self.running:
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self.running = True
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.running = False
+        self.thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_stage(results, rows, stage, func):
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start
+    results.append(dict(rows=rows, stage=stage, seconds=round(seconds, 4), peak_rss_mb=round(memory.peak / 1024**2, 1)))
+    print(f"{rows:>10} {stage:<14} {seconds:>9.3f}s {memory.peak / 1024**2:>9.1f}MB")
+    return value
+
+def run_size(rows, pair='EUR_USD', config=None, seed=0):
+    """
+    Times every pipeline stage on one synthetic series, writing to a throwaway directory.
+    """
+    config = backtesting.DEFAULT_CONFIG if config is None else config
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='bench_')
+    try:
+        candles = run_stage(results, rows, 'generate', lambda: synthetic.generate_candles(rows, 'M5', pair, seed=seed))
+        run_stage(results, rows, 'write', lambda: candle_store.write_candles(candles, pair, 'M5', work_dir))
+        del candles
+        df = run_stage(results, rows, 'load', lambda: candle_store.read_candles(pair, 'M5', path=work_dir))
+        run_stage(results, rows, 'technicals', lambda: backtesting.apply_technicals(df, pair, config, cache=False))
+        ledger = run_stage(results, rows, 'state_machine', lambda: engine.run_state_machine(df, pair, config))
+        run_stage(results, rows, 'metrics', lambda: metrics.compute_metrics(ledger))
+
+        def save():
+            df.reset_index(inplace=True)
+            ledger.to_pickle(f"{work_dir}/{pair}_M5_trades.pkl")
+            df.to_pickle(f"{work_dir}/{pair}_M5_analyzed.pkl")
+        run_stage(results, rows, 'save', save)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def run_benchmark(sizes=None, pair='EUR_USD', seed=0, out_file=None):
+    """
+    Runs every size and writes {environment, results} JSON for compare() to read.
+    """
+    sizes = DEFAULT_ROWS if sizes is None else sizes
+    commit = get_commit()
+    report = dict(
+        commit=commit,
+        created=dt.datetime.now(dt.timezone.utc).isoformat(),
+        python=platform.python_version(),
+        numpy=np.__version__,
+        pandas=pd.__version__,
+        numba=engine.NUMBA_AVAILABLE,
+        cpu_count=os.cpu_count(),
+        pair=pair,
+        seed=seed,
+        results=[]
+    )
+
+    # compiles the state machine outside the timed runs
+    run_size(1000, pair, seed=seed)
+    for rows in sizes:
+        report['results'].extend(run_size(rows, pair, seed=seed))
+
+    if out_file is None:
+        os.makedirs(BENCHMARK_PATH, exist_ok=True)
+        stamp = dt.datetime.now().strftime('%Y%m%d_%H%M%S')
+        out_file = f"{BENCHMARK_PATH}/bench_{commit or 'nogit'}_{stamp}.json"
+    with open(out_file, 'w') as f:
+        f.write(json.dumps(report, indent=2))
+    print(f"benchmark written to {out_file}")
+    return report
+
+def compare(old_file, new_file):
+    """
+    Side by side seconds and peak RSS of two benchmark files, ratio < 1 means new is faster/smaller.
+    """
+    frames = []
+    for label, file_name in [('old', old_file), ('new', new_file)]:
+        with open(file_name, 'r') as f:
+            frames.append(pd.DataFrame(json.loads(f.read())['results']).set_index(['rows', 'stage']).add_prefix(f"{label}_"))
+    df = frames[0].join(frames[1], how='outer')
+    df['time_ratio'] = (df['new_seconds'] / df['old_seconds']).round(3)
+    df['rss_ratio'] = (df['new_peak_rss_mb'] / df['old_peak_rss_mb']).round(3)
+    print(df.to_string())
+    return df
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='time the candles -> technicals -> backtest pipeline on synthetic data')
+    arg_parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    arg_parser.add_argument('--pair', default='EUR_USD')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--out', default=None)
+    arg_parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), default=None)
+    args = arg_parser.parse_args()
+
+    if args.compare is not None:
+        compare(*args.compare)
+    else:
+        run_benchmark(args.rows, args.pair, args.seed, args.out)
@@ -0,0 +1,436 @@
+import numpy as np
+import pandas as pd
+from backtesting import fills
+from infrastructure import schema
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        # plain python fallback so the kernel still runs without numba
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+STAGE_NONE = 0
+STAGE_BOTTOM = 1
+STAGE_EXIT = 2
+STAGE_REENTRY = 3
+STAGE_CONFIRMATION = 4
+STAGE_IN_TRADE = 5
+STAGE_LABELS = [None, 'bottom', 'exit', 'reentry', 'confirmation', 'in_trade']
+
+TRADE_NONE = 0
+TRADE_OPENED = 1
+TRADE_CLOSED_SL = 2
+TRADE_LABELS = [None, 'opened', 'closed - sl']
+
+RESULT_COLUMNS = ['entry_price', 'stop_loss', 'take_profit', 'pips']
+EXTRA_COLUMNS = ['rows_since_bottom', 'bottom_low', 'rows_since_entry']
+LEDGER_COLUMNS = [
+    'entry_idx', 'exit_idx', 'bottom_idx', 'entry_time', 'exit_time', 'entry_price', 'exit_price',
+    'stop_loss', 'take_profit', 'bottom_low', 'pips', 'bars_held', 'closed'
+]
+
+@njit(cache=True)
+def _state_machine(mid_h, mid_l, mid_c, is_bottom, in_downtrend, strong_bullish,
+                   sl_tp_pips, exit_threshold_pips, tp_to_sl_ratio, reentry_max_space, pip_divisor):
+    n = len(mid_h)
+    stage = np.zeros(n, dtype=np.int8)
+    trade = np.zeros(n, dtype=np.int8)
+    entry_price = np.full(n, np.nan)
+    stop_loss = np.full(n, np.nan)
+    take_profit = np.full(n, np.nan)
+    pips = np.full(n, np.nan)
+    rows_since_bottom = np.full(n, np.nan)
+    bottom_low = np.full(n, np.nan)
+    rows_since_entry = np.full(n, np.nan)
+
+    in_trade = False
+    trade_entry_idx = 0
+    trade_entry_price = 0.0
+    trade_stop_loss = 0.0
+    trade_take_profit = 0.0
+    zone_low = 0.0
+    zone_high = 0.0
+    bottom_idx = 0
+    current_stage = STAGE_NONE
+    reentry_idx = 0
+    exit_threshold_price = 0.0
+    trailing_active = False
+    trailing_distance_pips = 0.0
+
+    for i in range(n):
+        stage[i] = current_stage
+
+        if not in_trade:
+            # locate bottom
+            if is_bottom[i] and in_downtrend[i]:
+                zone_low = mid_l[i]
+                zone_high = mid_h[i]
+                bottom_idx = i
+                current_stage = STAGE_BOTTOM
+                stage[i] = current_stage
+                continue
+
+            elif is_bottom[i]:
+                current_stage = STAGE_NONE
+                stage[i] = current_stage
+                continue
+
+            if current_stage == STAGE_BOTTOM:
+                # locate exit
+                if mid_l[i] > zone_high:
+                    current_stage = STAGE_EXIT
+                    stage[i] = current_stage
+                    exit_threshold_price = zone_high + exit_threshold_pips
+                continue
+
+            if current_stage == STAGE_EXIT:
+                # detect exit threshold breach
+                if mid_h[i] > exit_threshold_price:
+                    current_stage = STAGE_NONE
+                    continue
+
+                # detect reentry into zone
+                if mid_l[i] < zone_high and mid_l[i] > zone_low:
+                    current_stage = STAGE_REENTRY
+                    reentry_idx = i
+                    stage[i] = current_stage
+                    continue
+
+            if current_stage == STAGE_REENTRY:
+                # detect confirmation candle (entry candle)
+                if i > (reentry_idx + reentry_max_space):
+                    current_stage = STAGE_NONE
+                    continue
+
+                if strong_bullish[i]:
+                    current_stage = STAGE_CONFIRMATION
+                    stage[i] = current_stage
+                    trade[i] = TRADE_OPENED
+                    trade_entry_price = mid_c[i]
+                    trade_stop_loss = zone_low - sl_tp_pips
+                    trade_take_profit = trade_entry_price + ((trade_entry_price - trade_stop_loss) * tp_to_sl_ratio)
+                    entry_price[i] = trade_entry_price
+                    stop_loss[i] = trade_stop_loss
+                    take_profit[i] = trade_take_profit
+                    rows_since_bottom[i] = i - bottom_idx
+                    bottom_low[i] = zone_low
+                    trade_entry_idx = i
+                    in_trade = True
+
+        if in_trade:
+            current_stage = STAGE_IN_TRADE
+            stage[i] = current_stage
+
+            # SL check — always comes first
+            if mid_l[i] <= trade_stop_loss:
+                trade[i] = TRADE_CLOSED_SL
+                pips[i] = (trade_stop_loss - trade_entry_price) * pip_divisor
+                rows_since_entry[i] = i - trade_entry_idx
+                in_trade = False
+                current_stage = STAGE_NONE
+                trailing_active = False
+                stage[i] = current_stage
+                continue
+
+            # TP check — initialize trailing stop if not active
+            if mid_h[i] >= trade_take_profit:
+                if not trailing_active:
+                    trailing_active = True
+                    trailing_distance_pips = (trade_take_profit - trade_entry_price) * pip_divisor
+                    stop_loss[i] = mid_c[i] - (trailing_distance_pips / pip_divisor)
+                else:
+                    new_stop = mid_c[i] - (trailing_distance_pips / pip_divisor)
+                    if new_stop > trade_stop_loss:
+                        trade_stop_loss = new_stop
+                        stop_loss[i] = new_stop
+
+    return (stage, trade, entry_price, stop_loss, take_profit, pips,
+            rows_since_bottom, bottom_low, rows_since_entry)
+
+def get_arrays(df):
+    """
+    Pulls the columns the state machine reads out of a technicals-applied df.
+    """
+    return dict(
+        mid_h=df['mid_h'].to_numpy(dtype=np.float64),
+        mid_l=df['mid_l'].to_numpy(dtype=np.float64),
+        mid_c=df['mid_c'].to_numpy(dtype=np.float64),
+        is_bottom=df['is_bottom'].to_numpy(dtype=np.bool_),
+        in_downtrend=df['in_downtrend'].to_numpy(dtype=np.bool_),
+        strong_bullish=df['strong_bullish'].to_numpy(dtype=np.bool_)
+    )
+
+def run_arrays(arrays, pair, config):
+    """
+    Runs the state machine over the dict returned by get_arrays.
+
+    Returns a tuple of per-row arrays: (stage, trade, entry_price, stop_loss, take_profit,
+    pips, rows_since_bottom, bottom_low, rows_since_entry).
+    """
+    pip_divisor = 100 if 'JPY' in pair else 10000
+    sl_tp_pips = config['sl_pips'] / pip_divisor
+    exit_threshold_pips = config['exit_threshold'] / pip_divisor
+
+    return _state_machine(
+        arrays['mid_h'],
+        arrays['mid_l'],
+        arrays['mid_c'],
+        arrays['is_bottom'],
+        arrays['in_downtrend'],
+        arrays['strong_bullish'],
+        float(sl_tp_pips),
+        float(exit_threshold_pips),
+        float(config['tp_to_sl_ratio']),
+        int(config['reentry_to_confirm_max_space']),
+        pip_divisor
+    )
+
+def summarize(entry_price, pips):
+    """
+    Trade counts and pip totals for one run, straight from the result arrays.
+    """
+    closed_pips = pips[~np.isnan(pips)]
+    closed = len(closed_pips)
+    return dict(
+        trades=int(np.count_nonzero(~np.isnan(entry_price))),
+        closed=closed,
+        wins=int(np.count_nonzero(closed_pips > 0)),
+        win_rate=round(float(np.count_nonzero(closed_pips > 0)) / closed * 100, 2) if closed else 0.0,
+        total_pips=round(float(closed_pips.sum()), 1),
+        avg_pips=round(float(closed_pips.mean()), 2) if closed else 0.0
+    )
+
+def build_ledger(result, pair, times=None):
+    """
+    One row per trade from the run_arrays result tuple, without another pass over the candles.
+
+    Row positions are kept as entry_idx / exit_idx / bottom_idx; times (datetime64 per row)
+    fills entry_time / exit_time. A trade still open on the last row has closed=False,
+    exit_idx -1, NaN pips and bars_held counted to the last row.
+    """
+    (stage, trade, entry_price, stop_loss, take_profit, pips,
+     rows_since_bottom, bottom_low, rows_since_entry) = result
+    pip_divisor = 100 if 'JPY' in pair else 10000
+
+    entry_idx = np.flatnonzero(~np.isnan(entry_price))
+    exits = np.flatnonzero(~np.isnan(pips))
+    # trades never overlap, so each entry closes on the first exit at or after it
+    k = np.searchsorted(exits, entry_idx, side='left')
+    closed = k < len(exits)
+    exit_idx = np.where(closed, exits[np.minimum(k, len(exits) - 1)] if len(exits) > 0 else -1, -1)
+
+    trade_pips = np.where(closed, pips[exit_idx], np.nan)
+    last_idx = np.where(closed, exit_idx, len(entry_price) - 1)
+
+    ledger = pd.DataFrame({
+        'entry_idx': entry_idx,
+        'exit_idx': exit_idx,
+        'bottom_idx': entry_idx - rows_since_bottom[entry_idx].astype(np.int64),
+        'entry_time': pd.to_datetime(times[entry_idx], utc=True) if times is not None else pd.NaT,
+        'exit_time': pd.to_datetime(np.where(closed, times[last_idx], np.datetime64('NaT')), utc=True) if times is not None else pd.NaT,
+        'entry_price': entry_price[entry_idx],
+        'exit_price': entry_price[entry_idx] + trade_pips / pip_divisor,
+        'stop_loss': stop_loss[entry_idx],
+        'take_profit': take_profit[entry_idx],
+        'bottom_low': bottom_low[entry_idx],
+        'pips': trade_pips,
+        'bars_held': last_idx - entry_idx,
+        'closed': closed
+    })
+    return ledger
+
+def summarize_ledger(ledger):
+    """
+    summarize() plus average bars held, from a ledger. Repriced ledgers (fills.apply_fills) also
+    report the trades they dropped for overlapping.
+    """
+    summary = summarize(ledger['entry_price'].to_numpy(), ledger['pips'].to_numpy())
+    bars_held = ledger['bars_held'].to_numpy()[ledger['closed'].to_numpy()]
+    summary['avg_bars_held'] = round(float(bars_held.mean()), 2) if len(bars_held) > 0 else 0.0
+    if 'dropped_overlaps' in ledger.attrs:
+        summary['dropped_overlaps'] = ledger.attrs['dropped_overlaps']
+    return summary
+
+def run_ledger(arrays, pair, config, times=None, fill_config=None):
+    """
+    Runs the state machine and returns only (ledger, summary); the per-row arrays are dropped.
+    With fill_config (see fills.DEFAULT_FILLS) the ledger is repriced on bid/ask, arrays then
+    also needs the fills.get_arrays columns.
+    """
+    ledger = build_ledger(run_arrays(arrays, pair, config), pair, times)
+    if fill_config is not None:
+        ledger = fills.apply_fills(ledger, arrays, pair, fill_config, times)
+    return ledger, summarize_ledger(ledger)
+
+def get_times(df):
+    # datetime64 utc times for build_ledger
+    return df['time'].dt.tz_convert('UTC').to_numpy(dtype='datetime64[ns]')
+
+def run_state_machine(df, pair, config):
+    """
+    Runs the bottom -> exit -> reentry -> confirmation -> in_trade state machine
+    over plain numpy arrays and writes the result columns back to df in one go.
+
+    Rows are walked by position, so df does not need a fresh RangeIndex.
+
+    stage and trade are written as categoricals over STAGE_LABELS / TRADE_LABELS (int8 codes,
+    missing when empty) and the price results as float64 with NaN when empty.
+
+    Returns the trade ledger (see build_ledger) with its summary in ledger.attrs['summary'].
+    """
+    result = run_arrays(get_arrays(df), pair, config)
+    (stage, trade, entry_price, stop_loss, take_profit, pips,
+     rows_since_bottom, bottom_low, rows_since_entry) = result
+
+    df['trade'] = schema.to_category(trade, TRADE_LABELS)
+    df['entry_price'] = entry_price
+    df['stop_loss'] = stop_loss
+    df['take_profit'] = take_profit
+    df['pips'] = pips
+    df['stage'] = schema.to_category(stage, STAGE_LABELS)
+    df['rows_since_bottom'] = rows_since_bottom.astype(np.float32)
+    df['bottom_low'] = bottom_low
+    df['rows_since_entry'] = rows_since_entry.astype(np.float32)
+
+    ledger = build_ledger(result, pair, get_times(df))
+    ledger.attrs['summary'] = summarize_ledger(ledger)
+    return ledger
+
+class PairStateMachine:
+    """
+    One-candle-at-a-time version of _state_machine for live trading. Feed it each completed
+    candle plus its technicals (see technicals.streaming.TechnicalsEngine) and it returns the
+    same per-row values the batch engine would have written for that row.
+
+    get_state / load_state round-trip everything needed to resume after a restart.
+    """
+    STATE_KEYS = [
+        'index', 'in_trade', 'trade_entry_idx', 'trade_entry_price', 'trade_stop_loss', 'trade_take_profit',
+        'zone_low', 'zone_high', 'bottom_idx', 'current_stage', 'reentry_idx', 'exit_threshold_price',
+        'trailing_active', 'trailing_distance_pips'
+    ]
+
+    def __init__(self, pair, config):
+        self.pair = pair
+        self.config = config
+        self.pip_divisor = 100 if 'JPY' in pair else 10000
+        self.sl_tp_pips = config['sl_pips'] / self.pip_divisor
+        self.exit_threshold_pips = config['exit_threshold'] / self.pip_divisor
+
+        self.index = -1
+        self.in_trade = False
+        self.trade_entry_idx = 0
+        self.trade_entry_price = 0.0
+        self.trade_stop_loss = 0.0
+        self.trade_take_profit = 0.0
+        self.zone_low = 0.0
+        self.zone_high = 0.0
+        self.bottom_idx = 0
+        self.current_stage = STAGE_NONE
+        self.reentry_idx = 0
+        self.exit_threshold_price = 0.0
+        self.trailing_active = False
+        self.trailing_distance_pips = 0.0
+
+    def get_state(self):
+        return {k: getattr(self, k) for k in self.STATE_KEYS}
+
+    def load_state(self, state):
+        for k in self.STATE_KEYS:
+            setattr(self, k, state[k])
+
+    def step(self, candle, technicals):
+        """
+        candle: mapping with mid_h, mid_l, mid_c. technicals: mapping with is_bottom, in_downtrend, strong_bullish.
+        Returns dict(stage, trade, entry_price, stop_loss, take_profit, pips) for this candle, None when empty.
+        """
+        self.index += 1
+        i = self.index
+        row = dict(stage=self.current_stage, trade=TRADE_NONE, entry_price=None, stop_loss=None, take_profit=None, pips=None)
+        self._step(i, candle['mid_h'], candle['mid_l'], candle['mid_c'],
+                   technicals['is_bottom'], technicals['in_downtrend'], technicals['strong_bullish'], row)
+        row['stage'] = STAGE_LABELS[row['stage']]
+        row['trade'] = TRADE_LABELS[row['trade']]
+        return row
+
+    def _step(self, i, mid_h, mid_l, mid_c, is_bottom, in_downtrend, strong_bullish, row):
+        # keep in sync with _state_machine
+        if not self.in_trade:
+            if is_bottom and in_downtrend:
+                self.zone_low = mid_l
+                self.zone_high = mid_h
+                self.bottom_idx = i
+                self.current_stage = STAGE_BOTTOM
+                row['stage'] = self.current_stage
+                return
+
+            elif is_bottom:
+                self.current_stage = STAGE_NONE
+                row['stage'] = self.current_stage
+                return
+
+            if self.current_stage == STAGE_BOTTOM:
+                if mid_l > self.zone_high:
+                    self.current_stage = STAGE_EXIT
+                    row['stage'] = self.current_stage
+                    self.exit_threshold_price = self.zone_high + self.exit_threshold_pips
+                return
+
+            if self.current_stage == STAGE_EXIT:
+                if mid_h > self.exit_threshold_price:
+                    self.current_stage = STAGE_NONE
+                    return
+
+                if mid_l < self.zone_high and mid_l > self.zone_low:
+                    self.current_stage = STAGE_REENTRY
+                    self.reentry_idx = i
+                    row['stage'] = self.current_stage
+                    return
+
+            if self.current_stage == STAGE_REENTRY:
+                if i > (self.reentry_idx + self.config['reentry_to_confirm_max_space']):
+                    self.current_stage = STAGE_NONE
+                    return
+
+                if strong_bullish:
+                    self.current_stage = STAGE_CONFIRMATION
+                    row['stage'] = self.current_stage
+                    row['trade'] = TRADE_OPENED
+                    self.trade_entry_price = mid_c
+                    self.trade_stop_loss = self.zone_low - self.sl_tp_pips
+                    self.trade_take_profit = self.trade_entry_price + ((self.trade_entry_price - self.trade_stop_loss) * self.config['tp_to_sl_ratio'])
+                    row['entry_price'] = self.trade_entry_price
+                    row['stop_loss'] = self.trade_stop_loss
+                    row['take_profit'] = self.trade_take_profit
+                    self.trade_entry_idx = i
+                    self.in_trade = True
+
+        if self.in_trade:
+            self.current_stage = STAGE_IN_TRADE
+            row['stage'] = self.current_stage
+
+            if mid_l <= self.trade_stop_loss:
+                row['trade'] = TRADE_CLOSED_SL
+                row['pips'] = (self.trade_stop_loss - self.trade_entry_price) * self.pip_divisor
+                self.in_trade = False
+                self.current_stage = STAGE_NONE
+                self.trailing_active = False
+                row['stage'] = self.current_stage
+                return
+
+            if mid_h >= self.trade_take_profit:
+                if not self.trailing_active:
+                    self.trailing_active = True
+                    self.trailing_distance_pips = (self.trade_take_profit - self.trade_entry_price) * self.pip_divisor
+                    row['stop_loss'] = mid_c - (self.trailing_distance_pips / self.pip_divisor)
+                else:
+                    new_stop = mid_c - (self.trailing_distance_pips / self.pip_divisor)
+                    if new_stop > self.trade_stop_loss:
+                        self.trade_stop_loss = new_stop
+                        row['stop_loss'] = new_stop
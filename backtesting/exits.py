@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+from infrastructure import schema
+
+EXIT_OPEN = 0
+EXIT_SL = 1
+EXIT_TP = 2
+EXIT_TRAILING = 3
+EXIT_LABELS = [None, 'sl', 'tp', 'trailing']
+
+# cap on bars gathered at once (queries x window), keeps the 2-D scans to a few tens of MB
+MAX_ELEMENTS = 4_000_000
+
+def _windows(starts, window, n):
+    # (rows, window) bar indices from each start, clipped to the series, plus the in-range mask
+    idx = starts[:, None] + np.arange(window)[None, :]
+    valid = idx < n
+    return np.minimum(idx, n - 1), valid
+
+def _chunks(count, window):
+    size = max(1, MAX_ELEMENTS // window)
+    for i in range(0, count, size):
+        yield slice(i, min(i + size, count))
+
+def first_touch(high, low, starts, below, above, window=64):
+    """
+    For each query, the first bar j >= start with low[j] <= below or high[j] >= above,
+    -1 if neither happens. Pass -inf / inf to watch only one side.
+
+    Queries are scanned in growing windows: each round gathers the next `window` bars of every
+    still open query as one 2-D array, so the total work is proportional to the bars actually
+    waited through (plus one window per query) rather than queries x series length.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    below = np.broadcast_to(np.asarray(below, dtype=np.float64), starts.shape)
+    above = np.broadcast_to(np.asarray(above, dtype=np.float64), starts.shape)
+    n = len(high)
+    result = np.full(len(starts), -1, dtype=np.int64)
+
+    active = np.flatnonzero(starts < n)
+    position = starts.copy()
+    while len(active) > 0:
+        still_open = []
+        for rows in _chunks(len(active), window):
+            q = active[rows]
+            idx, valid = _windows(position[q], window, n)
+            hit = valid & ((low[idx] <= below[q, None]) | (high[idx] >= above[q, None]))
+            found = hit.any(axis=1)
+            result[q[found]] = idx[found, np.argmax(hit[found], axis=1)]
+
+            remaining = q[~found]
+            position[remaining] += window
+            still_open.append(remaining[position[remaining] < n])
+        active = np.concatenate(still_open)
+        window *= 2
+    return result
+
+def resolve_exits(high, low, close, entry_idx, entry_price, stop_loss, take_profit, trailing=False, window=64):
+    """
+    Exits for a batch of long entries over one series, all arrays per entry.
+
+    Bars are checked from the entry bar on, stop loss before take profit on the same bar.
+    Without trailing a trade exits at the first touch of either level. With trailing, reaching
+    take profit arms a trailing stop instead, following backtesting.engine: from the next bar
+    the stop is the best of the initial stop and close - (take_profit - entry_price) over the
+    earlier bars whose high reached take profit, and the trade exits at the first low at or
+    below it. The trailing stop is a running max, scanned in the same growing windows.
+
+    Returns dict of arrays: exit_idx (-1 if still open), exit_price, exit_reason (EXIT_*).
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    stop_loss = np.asarray(stop_loss, dtype=np.float64)
+    take_profit = np.asarray(take_profit, dtype=np.float64)
+    n = len(high)
+
+    touched = first_touch(high, low, entry_idx, stop_loss, take_profit, window)
+    exit_idx = np.full(len(entry_idx), -1, dtype=np.int64)
+    exit_price = np.full(len(entry_idx), np.nan)
+    exit_reason = np.full(len(entry_idx), EXIT_OPEN, dtype=np.int8)
+
+    # the stop loss is checked first, so a bar touching both levels is a stop
+    at = np.maximum(touched, 0)
+    by_sl = (touched >= 0) & (low[at] <= stop_loss)
+    by_tp = (touched >= 0) & ~by_sl
+    exit_idx[by_sl] = touched[by_sl]
+    exit_price[by_sl] = stop_loss[by_sl]
+    exit_reason[by_sl] = EXIT_SL
+
+    if not trailing:
+        exit_idx[by_tp] = touched[by_tp]
+        exit_price[by_tp] = take_profit[by_tp]
+        exit_reason[by_tp] = EXIT_TP
+        return dict(exit_idx=exit_idx, exit_price=exit_price, exit_reason=exit_reason)
+
+    # trailing phase, one row of state per armed trade: next bar to check and the current stop
+    armed = np.flatnonzero(by_tp)
+    distance = take_profit - entry_price
+    position = touched.copy()
+    position[armed] += 1
+    stop = stop_loss.copy()
+
+    active = armed[position[armed] < n]
+    while len(active) > 0:
+        still_open = []
+        for rows in _chunks(len(active), window):
+            q = active[rows]
+            idx, valid = _windows(position[q], window, n)
+            # a bar can raise the stop for the bars after it, never for itself
+            raise_to = np.where(valid & (high[idx] >= take_profit[q, None]), close[idx] - distance[q, None], -np.inf)
+            running = np.maximum.accumulate(raise_to, axis=1)
+            previous = np.concatenate([np.full((len(q), 1), -np.inf), running[:, :-1]], axis=1)
+            current_stop = np.maximum(stop[q, None], previous)
+
+            hit = valid & (low[idx] <= current_stop)
+            found = hit.any(axis=1)
+            first = np.argmax(hit[found], axis=1)
+            done = q[found]
+            exit_idx[done] = idx[found, first]
+            exit_price[done] = current_stop[found, first]
+            exit_reason[done] = EXIT_TRAILING
+
+            remaining = q[~found]
+            stop[remaining] = np.maximum(stop[remaining], running[~found, -1])
+            position[remaining] += window
+            still_open.append(remaining[position[remaining] < n])
+        active = np.concatenate(still_open)
+        window *= 2
+
+    return dict(exit_idx=exit_idx, exit_price=exit_price, exit_reason=exit_reason)
+
+def resolve_ledger(arrays, entries, pair, trailing=True, times=None):
+    """
+    engine.build_ledger style ledger for entries (a frame with entry_idx, entry_price,
+    stop_loss, take_profit, e.g. an existing ledger) with every exit resolved independently,
+    plus an exit_reason column. arrays is engine.get_arrays (only mid_h/mid_l/mid_c are read).
+    """
+    pip_divisor = 100 if 'JPY' in pair else 10000
+    entry_idx = entries['entry_idx'].to_numpy(dtype=np.int64)
+    entry_price = entries['entry_price'].to_numpy(dtype=np.float64)
+    exits = resolve_exits(arrays['mid_h'], arrays['mid_l'], arrays['mid_c'], entry_idx, entry_price,
+                          entries['stop_loss'].to_numpy(), entries['take_profit'].to_numpy(), trailing)
+
+    exit_idx = exits['exit_idx']
+    closed = exit_idx >= 0
+    last_idx = np.where(closed, exit_idx, len(arrays['mid_h']) - 1)
+    ledger = pd.DataFrame({
+        'entry_idx': entry_idx,
+        'exit_idx': exit_idx,
+        'bottom_idx': entries['bottom_idx'].to_numpy() if 'bottom_idx' in entries.columns else -1,
+        'entry_time': pd.to_datetime(times[entry_idx], utc=True) if times is not None else pd.NaT,
+        'exit_time': pd.to_datetime(np.where(closed, times[last_idx], np.datetime64('NaT')), utc=True) if times is not None else pd.NaT,
+        'entry_price': entry_price,
+        'exit_price': exits['exit_price'],
+        'stop_loss': entries['stop_loss'].to_numpy(),
+        'take_profit': entries['take_profit'].to_numpy(),
+        'bottom_low': entries['bottom_low'].to_numpy() if 'bottom_low' in entries.columns else np.nan,
+        'pips': (exits['exit_price'] - entry_price) * pip_divisor,
+        'bars_held': last_idx - entry_idx,
+        'closed': closed
+    })
+    ledger['exit_reason'] = schema.to_category(exits['exit_reason'], EXIT_LABELS)
+    return ledger
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from backtesting import exits
+from infrastructure import schema
+
+# slippage applies to market fills (entries and stops), commission is per round trip; both in pips
+DEFAULT_FILLS = dict(slippage_pips=0.2, commission_pips=0.0)
+FILL_COLUMNS = ['bid_o', 'bid_h', 'bid_l', 'bid_c', 'ask_c']
+
+def has_prices(df):
+    return all(col in df.columns for col in FILL_COLUMNS)
+
+def get_arrays(df):
+    """
+    The bid/ask columns apply_fills reads, alongside engine.get_arrays. Candles downloaded
+    with price='MBA' (get_candles_df) carry them.
+    """
+    if not has_prices(df):
+        raise ValueError(f"bid/ask fills need the {FILL_COLUMNS} columns, download candles with price='MBA'")
+    return {col: df[col].to_numpy(dtype=np.float64) for col in FILL_COLUMNS}
+
+def drop_overlaps(entry_idx, exit_idx):
+    """
+    Keep mask over trades in entry order: a trade entering on or before the exit bar of the
+    last kept trade (or after a kept trade that never closed) could not have been taken.
+    """
+    keep = np.ones(len(entry_idx), dtype=np.bool_)
+    busy_until = -1
+    for k in range(len(entry_idx)):
+        if entry_idx[k] <= busy_until:
+            keep[k] = False
+            continue
+        busy_until = exit_idx[k] if exit_idx[k] >= 0 else np.iinfo(np.int64).max
+    return keep
+
+def apply_fills(ledger, arrays, pair, fills=None, times=None):
+    """
+    Reprices a mid-price ledger (engine.build_ledger) as a long account would see it:
+
+        entry       ask close of the confirmation candle + slippage
+        stop exits  triggered by the bid low, filled at the stop - slippage, or at the bid open
+                    when the candle opened through the stop
+        take profit armed by the bid high (see exits.resolve_exits)
+        pips        exit fill - entry fill, less commission
+
+    The entries stay those of the mid-price state machine, only the exits are resolved again
+    on bid prices. The mid result is kept as mid_pips, exit_reason says what closed the trade.
+    A repriced exit can land after the next mid entry; those later entries overlap a position
+    the account still holds, so they are dropped and counted in attrs['dropped_overlaps'],
+    which engine.summarize_ledger reports.
+    Everything is whole-array numpy, so repricing costs about as much as one exit scan.
+    """
+    fills = DEFAULT_FILLS if fills is None else fills
+    pip_divisor = 100 if 'JPY' in pair else 10000
+    slippage = fills['slippage_pips'] / pip_divisor
+
+    entry_idx = ledger['entry_idx'].to_numpy(dtype=np.int64)
+    stop_loss = ledger['stop_loss'].to_numpy(dtype=np.float64)
+    take_profit = ledger['take_profit'].to_numpy(dtype=np.float64)
+    # the trailing distance is set from the mid entry, as the strategy placed it
+    resolved = exits.resolve_exits(arrays['bid_h'], arrays['bid_l'], arrays['bid_c'], entry_idx,
+                                   ledger['entry_price'].to_numpy(dtype=np.float64), stop_loss, take_profit, trailing=True)
+
+    exit_idx = resolved['exit_idx']
+    closed = exit_idx >= 0
+    at = np.maximum(exit_idx, 0)
+    entry_fill = arrays['ask_c'][entry_idx] + slippage
+    # the entry candle's open came before the entry, so only later candles can gap through the stop
+    gapped = closed & (exit_idx > entry_idx) & (arrays['bid_o'][at] < resolved['exit_price'])
+    exit_fill = np.where(gapped, arrays['bid_o'][at], resolved['exit_price']) - slippage
+    exit_fill = np.where(closed, exit_fill, np.nan)
+    last_idx = np.where(closed, exit_idx, len(arrays['bid_c']) - 1)
+
+    filled = ledger.copy()
+    filled['mid_pips'] = filled['pips']
+    filled['exit_idx'] = exit_idx
+    filled['exit_time'] = pd.to_datetime(np.where(closed, times[last_idx], np.datetime64('NaT')), utc=True) if times is not None else pd.NaT
+    filled['entry_fill'] = entry_fill
+    filled['exit_price'] = exit_fill
+    filled['pips'] = (exit_fill - entry_fill) * pip_divisor - fills['commission_pips']
+    filled['bars_held'] = last_idx - entry_idx
+    filled['closed'] = closed
+    filled['exit_reason'] = schema.to_category(resolved['exit_reason'], exits.EXIT_LABELS)
+
+    keep = drop_overlaps(entry_idx, exit_idx)
+    filled = filled[keep].reset_index(drop=True)
+    filled.attrs['dropped_overlaps'] = int((~keep).sum())
+    return filled
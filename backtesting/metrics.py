@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+METRIC_COLUMNS = [
+    'trades', 'wins', 'win_rate', 'total_pips', 'expectancy', 'avg_win', 'avg_loss', 'profit_factor',
+    'max_drawdown', 'sharpe', 'sortino', 'avg_bars_held'
+]
+
+def stack_ledgers(ledgers):
+    """
+    Flattens closed trades of many ledgers into (run, pips, bars_held) arrays ordered by run,
+    then exit. ledgers is one ledger, a list of them or a dict; returns the run keys as well.
+    """
+    if isinstance(ledgers, pd.DataFrame):
+        ledgers = [ledgers]
+    keys = list(ledgers.keys()) if isinstance(ledgers, dict) else list(range(len(ledgers)))
+    frames = list(ledgers.values()) if isinstance(ledgers, dict) else list(ledgers)
+
+    if len(frames) == 0:
+        return keys, np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+
+    # one concat and whole-array numpy, per ledger pandas calls would dominate for thousands of small ledgers
+    lengths = np.array([len(ledger) for ledger in frames])
+    stacked = pd.concat(frames, ignore_index=True)
+    run = np.repeat(np.arange(len(frames)), lengths)
+    pips = stacked['pips'].to_numpy(dtype=np.float64)
+    bars_held = stacked['bars_held'].to_numpy(dtype=np.float64)
+    mask = stacked['closed'].to_numpy(dtype=np.bool_) if 'closed' in stacked.columns else ~np.isnan(pips)
+
+    if 'exit_idx' in stacked.columns:
+        order = np.lexsort((stacked['exit_idx'].to_numpy()[mask], run[mask]))
+    else:
+        order = np.arange(np.count_nonzero(mask))
+    return keys, run[mask][order], pips[mask][order], bars_held[mask][order]
+
+def max_drawdowns(run, pips, n_runs):
+    """
+    Largest peak to trough drop of each run's cumulative pips, starting from 0 equity.
+    run must be sorted. One maximum.accumulate covers every run: each run is shifted above
+    the previous one so the running max never carries over between runs.
+    """
+    drawdown = np.zeros(n_runs)
+    if len(pips) == 0:
+        return drawdown
+
+    starts = np.flatnonzero(np.r_[True, run[1:] != run[:-1]])
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(run)]))
+    cumulative = np.cumsum(pips)
+    base = (cumulative - pips)[starts]
+    equity = cumulative - base[group]
+
+    low = np.minimum(np.minimum.reduceat(equity, starts), 0.0)
+    high = np.maximum(np.maximum.reduceat(equity, starts), 0.0)
+    shift = np.cumsum(high - low + 1.0) - (high - low + 1.0) - low
+    peak = np.maximum.accumulate(equity + shift[group]) - shift[group]
+    peak = np.maximum(peak, 0.0)
+
+    drawdown[run[starts]] = np.maximum.reduceat(peak - equity, starts)
+    return drawdown
+
+def compute_metrics(ledgers, periods_per_year=None):
+    """
+    Performance metrics for one or many trade ledgers (see engine.build_ledger), one row per
+    ledger, all in pips on closed trades:
+
+        win_rate      % of trades with positive pips
+        expectancy    mean pips per trade
+        profit_factor gross won / gross lost (inf with no losing trades)
+        max_drawdown  largest drop of the cumulative pips curve, in exit order
+        sharpe        mean / std of trade pips
+        sortino       mean / downside deviation of trade pips
+
+    sharpe and sortino here are per-trade ratios on pips, not the usual ratios of periodic
+    returns of an equity curve: they ignore time between trades and position size. Use
+    equity_metrics on a portfolio.simulate equity curve for the time based figures.
+    periods_per_year annualizes them by sqrt(periods_per_year), e.g. the number of trades a
+    year. Everything is computed with bincount over all trades at once.
+    """
+    keys, run, pips, bars_held = stack_ledgers(ledgers)
+    n = len(keys)
+
+    trades = np.bincount(run, minlength=n).astype(np.float64)
+    wins = np.bincount(run, weights=(pips > 0).astype(np.float64), minlength=n)
+    losses = np.bincount(run, weights=(pips < 0).astype(np.float64), minlength=n)
+    total = np.bincount(run, weights=pips, minlength=n)
+    gross_win = np.bincount(run, weights=np.where(pips > 0, pips, 0.0), minlength=n)
+    gross_loss = np.bincount(run, weights=np.where(pips < 0, -pips, 0.0), minlength=n)
+    bars = np.bincount(run, weights=bars_held, minlength=n)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(trades > 0, total / trades, 0.0)
+        variance = np.bincount(run, weights=(pips - mean[run])**2, minlength=n) / (trades - 1)
+        std = np.sqrt(np.where(trades > 1, variance, np.nan))
+        downside = np.sqrt(np.bincount(run, weights=np.minimum(pips, 0.0)**2, minlength=n) / trades)
+
+        sharpe = np.where(std > 0, mean / std, np.nan)
+        sortino = np.where(downside > 0, mean / downside, np.nan)
+        if periods_per_year is not None:
+            sharpe = sharpe * np.sqrt(periods_per_year)
+            sortino = sortino * np.sqrt(periods_per_year)
+
+        profit_factor = np.where(gross_loss > 0, gross_win / gross_loss, np.where(gross_win > 0, np.inf, np.nan))
+        metrics = pd.DataFrame({
+            'trades': trades.astype(np.int64),
+            'wins': wins.astype(np.int64),
+            'win_rate': np.where(trades > 0, wins / trades * 100, 0.0),
+            'total_pips': total,
+            'expectancy': mean,
+            'avg_win': np.where(wins > 0, gross_win / wins, 0.0),
+            'avg_loss': np.where(losses > 0, -gross_loss / losses, 0.0),
+            'profit_factor': profit_factor,
+            'max_drawdown': max_drawdowns(run, pips, n),
+            'sharpe': sharpe,
+            'sortino': sortino,
+            'avg_bars_held': np.where(trades > 0, bars / trades, 0.0)
+        }, index=keys)
+    return metrics
+
+def equity_metrics(equity, starting_equity=None, freq='D', periods_per_year=365):
+    """
+    Sharpe and Sortino on an equity curve (time, equity columns, as portfolio.simulate returns
+    it): equity is sampled at the end of every freq period, carried forward through periods
+    without events, and the ratios are taken over the period returns, annualized by
+    sqrt(periods_per_year) (calendar days by default, weekends count as flat days).
+    starting_equity is the value before the first event.
+    Returns a dict of periods, sharpe and sortino (NaN with fewer than two periods).
+    """
+    if len(equity) == 0:
+        return dict(periods=0, sharpe=np.nan, sortino=np.nan)
+    values = equity.set_index('time')['equity'].resample(freq).last().ffill().to_numpy(dtype=np.float64)
+    start = values[0] if starting_equity is None else float(starting_equity)
+    previous = np.r_[start, values[:-1]]
+    returns = values / previous - 1
+    if starting_equity is None:
+        returns = returns[1:]
+
+    if len(returns) < 2:
+        return dict(periods=len(returns), sharpe=np.nan, sortino=np.nan)
+    mean = returns.mean()
+    std = returns.std(ddof=1)
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0)**2))
+    scale = np.sqrt(periods_per_year)
+    return dict(
+        periods=len(returns),
+        sharpe=float(mean / std * scale) if std > 0 else np.nan,
+        sortino=float(mean / downside * scale) if downside > 0 else np.nan
+    )
+
+def sweep_metrics(results, periods_per_year=None):
+    """
+    Adds compute_metrics columns to a sweep.run_sweep(..., keep_ledgers=True) table.
+    """
+    metrics = compute_metrics(list(results['ledger']), periods_per_year)
+    metrics.index = results.index
+    extra = [c for c in METRIC_COLUMNS if c not in results.columns]
+    return results.join(metrics[extra])
@@ -0,0 +1,123 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+METHODS = ['bootstrap', 'shuffle']
+PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+# cap on the (simulations x trades) block held at once, 8M float64 = 64MB per array
+MAX_ELEMENTS = 8_000_000
+
+def get_pips(trades):
+    """
+    Closed trade pips in exit order from a ledger (engine.build_ledger, as pickled by
+    analyze_pair) or any array of per-trade pips.
+    """
+    if isinstance(trades, pd.DataFrame):
+        if 'exit_idx' in trades.columns:
+            trades = trades.sort_values(by='exit_idx', kind='stable')
+        closed = trades['closed'].to_numpy(dtype=np.bool_) if 'closed' in trades.columns else trades['pips'].notna().to_numpy()
+        return trades['pips'].to_numpy(dtype=np.float64)[closed]
+    pips = np.asarray(trades, dtype=np.float64)
+    return pips[~np.isnan(pips)]
+
+def load_trades(pair, granularity, path="./backtesting/results"):
+    return pd.read_pickle(f"{path}/{pair}_{granularity}_trades.pkl")
+
+def drawdowns(equity):
+    # per row largest drop from the running peak of the cumulative pips, starting from 0 equity
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0), axis=1)
+    return (peak - equity).max(axis=1)
+
+def simulate(trades, n_sims=10_000, method='bootstrap', n_trades=None, seed=0, ruin_pips=None):
+    """
+    Resamples the trade sequence n_sims times and returns one row per simulation:
+    total_pips, max_drawdown and min_equity (lowest point of the cumulative pips).
+
+    bootstrap draws n_trades (default: as many as there are) trades with replacement, so both
+    the ending equity and the path vary; shuffle reorders the same trades, so only the path
+    (drawdown) varies. Each chunk of simulations is one (rows, n_trades) array of pips whose
+    cumsum along axis 1 gives every equity curve at once; chunks are sized to MAX_ELEMENTS.
+    With ruin_pips a 'ruined' column flags curves that fell ruin_pips below the start.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    pips = get_pips(trades)
+    if len(pips) == 0:
+        raise ValueError("no closed trades to resample")
+    n_trades = len(pips) if n_trades is None or method == 'shuffle' else n_trades
+
+    rng = np.random.default_rng(seed)
+    chunk_rows = max(1, MAX_ELEMENTS // n_trades)
+    total = np.empty(n_sims)
+    max_drawdown = np.empty(n_sims)
+    min_equity = np.empty(n_sims)
+
+    for start in range(0, n_sims, chunk_rows):
+        rows = min(chunk_rows, n_sims - start)
+        if method == 'bootstrap':
+            sample = pips[rng.integers(0, len(pips), size=(rows, n_trades))]
+        else:
+            sample = rng.permuted(np.broadcast_to(pips, (rows, n_trades)), axis=1)
+        equity = np.cumsum(sample, axis=1, out=sample)
+        total[start:start + rows] = equity[:, -1]
+        max_drawdown[start:start + rows] = drawdowns(equity)
+        min_equity[start:start + rows] = np.minimum(equity.min(axis=1), 0.0)
+
+    sims = pd.DataFrame({'total_pips': total, 'max_drawdown': max_drawdown, 'min_equity': min_equity})
+    if ruin_pips is not None:
+        sims['ruined'] = sims['min_equity'] <= -ruin_pips
+    return sims
+
+def summarize(sims, trades=None, percentiles=None):
+    """
+    Percentiles of the simulated total pips and max drawdown, plus the share of losing runs
+    (and ruined runs when simulate was given ruin_pips). With trades the actual sequence's
+    total and drawdown are added, with the percentile they fall at among the simulations.
+    """
+    percentiles = PERCENTILES if percentiles is None else percentiles
+    summary = {}
+    for col in ['total_pips', 'max_drawdown']:
+        values = sims[col].to_numpy()
+        for p, v in zip(percentiles, np.percentile(values, percentiles)):
+            summary[f"{col}_p{p}"] = round(float(v), 1)
+        summary[f"{col}_mean"] = round(float(values.mean()), 1)
+
+    summary['loss_probability'] = round(float((sims['total_pips'] < 0).mean() * 100), 2)
+    if 'ruined' in sims.columns:
+        summary['ruin_probability'] = round(float(sims['ruined'].mean() * 100), 2)
+
+    if trades is not None:
+        equity = np.cumsum(get_pips(trades))[None, :]
+        actual_total = float(equity[0, -1]) if equity.shape[1] > 0 else 0.0
+        actual_drawdown = float(drawdowns(equity)[0]) if equity.shape[1] > 0 else 0.0
+        summary['actual_total_pips'] = round(actual_total, 1)
+        # rounded so summation order noise does not rank equal totals (shuffle) below the actual
+        summary['actual_total_pips_pct'] = round(float((sims['total_pips'].round(6) < round(actual_total, 6)).mean() * 100), 1)
+        summary['actual_max_drawdown'] = round(actual_drawdown, 1)
+        summary['actual_max_drawdown_pct'] = round(float((sims['max_drawdown'].round(6) < round(actual_drawdown, 6)).mean() * 100), 1)
+    return summary
+
+def run_pair(pair, granularity, n_sims=10_000, method='bootstrap', seed=0, ruin_pips=None):
+    """
+    Monte Carlo over the trades analyze_pair pickled for (pair, granularity).
+    """
+    start = time.perf_counter()
+    trades = load_trades(pair, granularity)
+    sims = simulate(trades, n_sims, method, seed=seed, ruin_pips=ruin_pips)
+    summary = summarize(sims, trades)
+    print(f"{pair} {granularity} --> {n_sims} {method} runs of {len(get_pips(trades))} trades in {round(time.perf_counter() - start, 2)}s")
+    print(pd.Series(summary).to_string())
+    return sims, summary
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='monte carlo resampling of the trades analyze_pair saved')
+    arg_parser.add_argument('pair')
+    arg_parser.add_argument('granularity')
+    arg_parser.add_argument('--sims', type=int, default=10_000)
+    arg_parser.add_argument('--method', choices=METHODS, default='bootstrap')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--ruin-pips', type=float, default=None)
+    args = arg_parser.parse_args()
+
+    run_pair(args.pair, args.granularity, args.sims, args.method, args.seed, args.ruin_pips)
@@ -0,0 +1,229 @@
+from concurrent.futures import ProcessPoolExecutor
+from backtesting import backtesting
+from backtesting import engine
+from backtesting import fills
+from backtesting import metrics
+from infrastructure.instrument_collection import InstrumentCollection
+import heapq
+import os
+import time
+import numpy as np
+import pandas as pd
+
+PORTFOLIO_CONFIG = {
+    "starting_equity": 10_000.0,
+    "account_currency": "USD",
+    # share of equity risked between entry and stop loss
+    "risk_per_trade": 0.01,
+    "max_positions": 5,
+    # margin of all open positions as a share of equity
+    "max_margin_ratio": 0.5
+}
+# used for pairs missing from the instruments file, 20:1
+DEFAULT_MARGIN_RATE = 0.05
+NEVER = np.iinfo(np.int64).max
+
+def get_margin_rates(ic: InstrumentCollection, pairs):
+    margin_rates = {}
+    for pair in pairs:
+        if pair in ic.instrument_dict.keys():
+            margin_rates[pair] = ic.instrument_dict[pair].marginRate
+        else:
+            print(f"{pair} not in instruments, using margin rate {DEFAULT_MARGIN_RATE}")
+            margin_rates[pair] = DEFAULT_MARGIN_RATE
+    return margin_rates
+
+def quote_to_account(pair, price, account_currency):
+    # value of one unit of the quote currency in the account currency
+    base, quote = pair.split('_')
+    if quote == account_currency:
+        return 1.0
+    if base == account_currency:
+        return 1.0 / price
+    raise ValueError(f"{pair} has no leg in {account_currency}, crosses are not supported")
+
+def base_to_account(pair, price, account_currency):
+    # value of one unit of the base currency (one traded unit) in the account currency
+    base, quote = pair.split('_')
+    if base == account_currency:
+        return 1.0
+    if quote == account_currency:
+        return price
+    raise ValueError(f"{pair} has no leg in {account_currency}, crosses are not supported")
+
+def to_ns(times):
+    # tz-aware ledger times -> int64 ns, NaT as NEVER so open trades sort last
+    values = times.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    return np.where(np.isnat(values), NEVER, values.astype(np.int64))
+
+def pair_ledger(pair, granularity, config, from_date=None, to_date=None, fill_config=None):
+    """
+    Worker entry point: one pair's trade ledger with times. The candles are dropped on return,
+    so only ledgers are ever held for the whole portfolio.
+    """
+    df = backtesting.load_pair(pair, granularity, from_date, to_date)
+    backtesting.apply_technicals(df, pair, config)
+    arrays = engine.get_arrays(df)
+    if fill_config is not None:
+        arrays.update(fills.get_arrays(df))
+    ledger, summary = engine.run_ledger(arrays, pair, config, engine.get_times(df), fill_config)
+    print(f"{pair} {granularity} --> {summary['trades']} trades")
+    return ledger
+
+def get_ledgers(pairs, granularity, config, from_date=None, to_date=None, fill_config=None, workers=None):
+    workers = min(workers or os.cpu_count() or 1, len(pairs))
+    if workers <= 1:
+        return {p: pair_ledger(p, granularity, config, from_date, to_date, fill_config) for p in pairs}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {p: executor.submit(pair_ledger, p, granularity, config, from_date, to_date, fill_config) for p in pairs}
+        return {p: f.result() for p, f in futures.items()}
+
+def _entries(pair_no, entry_ns):
+    for row, t in enumerate(entry_ns):
+        yield t, pair_no, row
+
+def simulate(ledgers, margin_rates=None, portfolio_config=None):
+    """
+    Replays the trade ledgers of many pairs (dict pair -> engine.build_ledger with times) as one
+    account, in a single pass over time.
+
+    Entries of all pairs are merged in time order (heapq.merge over the per-pair ledgers) and
+    every accepted position pushes its exit onto a heap, so at each entry the exits due by then
+    are popped first. An entry is sized to risk risk_per_trade of the current equity between
+    its entry and stop loss, and skipped when max_positions are open, the size rounds to zero
+    units, or its margin (units x price x marginRate) would take the open margin above
+    max_margin_ratio of equity. Equity is realized: a position's pips are booked at its exit.
+
+    Returns (trades, equity, summary): every ledger trade with its status, units, margin and
+    P&L in the account currency; equity, open positions and margin after each event; totals,
+    with sharpe and sortino of the daily equity (metrics.equity_metrics).
+    """
+    portfolio_config = PORTFOLIO_CONFIG if portfolio_config is None else portfolio_config
+    margin_rates = {} if margin_rates is None else margin_rates
+    account_currency = portfolio_config['account_currency']
+    pairs = list(ledgers.keys())
+
+    columns = {}
+    for pair in pairs:
+        ledger = ledgers[pair]
+        price = ledger['entry_fill'] if 'entry_fill' in ledger.columns else ledger['entry_price']
+        columns[pair] = dict(
+            entry_ns=to_ns(ledger['entry_time']),
+            exit_ns=np.where(ledger['closed'].to_numpy(), to_ns(ledger['exit_time']), NEVER),
+            entry_price=price.to_numpy(dtype=np.float64),
+            stop_loss=ledger['stop_loss'].to_numpy(dtype=np.float64),
+            pips=ledger['pips'].to_numpy(dtype=np.float64),
+            exit_price=ledger['exit_price'].to_numpy(dtype=np.float64),
+            status=np.full(len(ledger), 'skipped - max_positions', dtype=object),
+            units=np.zeros(len(ledger)),
+            margin=np.zeros(len(ledger)),
+            pnl=np.full(len(ledger), np.nan)
+        )
+        # fails early on pairs the account can not value
+        quote_to_account(pair, 1.0, account_currency)
+
+    equity = float(portfolio_config['starting_equity'])
+    margin_used = 0.0
+    exits = []
+    curve = []
+    max_open = 0
+    max_margin = 0.0
+
+    def close(event):
+        nonlocal equity, margin_used
+        exit_ns, pair_no, row = event
+        pair = pairs[pair_no]
+        c = columns[pair]
+        pip_divisor = 100 if 'JPY' in pair else 10000
+        pnl = c['units'][row] * c['pips'][row] / pip_divisor * quote_to_account(pair, c['exit_price'][row], account_currency)
+        c['pnl'][row] = pnl
+        c['status'][row] = 'closed'
+        equity += pnl
+        margin_used -= c['margin'][row]
+        curve.append((exit_ns, equity, len(exits), margin_used))
+
+    entries = heapq.merge(*[_entries(i, columns[p]['entry_ns']) for i, p in enumerate(pairs)])
+    for entry_ns, pair_no, row in entries:
+        # exits first on a tie: a stop hit inside the entry candle frees its slot before the close
+        while exits and exits[0][0] <= entry_ns:
+            close(heapq.heappop(exits))
+
+        pair = pairs[pair_no]
+        c = columns[pair]
+        if len(exits) >= portfolio_config['max_positions']:
+            continue
+
+        entry_price = c['entry_price'][row]
+        risk_per_unit = (entry_price - c['stop_loss'][row]) * quote_to_account(pair, entry_price, account_currency)
+        units = np.floor(round(equity * portfolio_config['risk_per_trade'] / risk_per_unit, 6)) if risk_per_unit > 0 else 0.0
+        if units < 1:
+            c['status'][row] = 'skipped - size'
+            continue
+
+        margin = units * base_to_account(pair, entry_price, account_currency) * margin_rates.get(pair, DEFAULT_MARGIN_RATE)
+        if margin_used + margin > equity * portfolio_config['max_margin_ratio']:
+            c['status'][row] = 'skipped - margin'
+            continue
+
+        c['units'][row] = units
+        c['margin'][row] = margin
+        c['status'][row] = 'open'
+        margin_used += margin
+        heapq.heappush(exits, (c['exit_ns'][row], pair_no, row))
+        max_open = max(max_open, len(exits))
+        max_margin = max(max_margin, margin_used)
+        curve.append((entry_ns, equity, len(exits), margin_used))
+
+    while exits and exits[0][0] != NEVER:
+        close(heapq.heappop(exits))
+
+    trades = pd.concat([
+        ledgers[p][['entry_time', 'exit_time', 'entry_price', 'stop_loss', 'exit_price', 'pips']].assign(
+            pair=p, status=columns[p]['status'], units=columns[p]['units'], margin=columns[p]['margin'], pnl=columns[p]['pnl']
+        ) for p in pairs
+    ], ignore_index=True).sort_values(by=['entry_time', 'pair'], kind='stable').reset_index(drop=True)
+
+    equity_df = pd.DataFrame(curve, columns=['time', 'equity', 'open_positions', 'margin_used'])
+    equity_df['time'] = pd.to_datetime(equity_df['time'], utc=True)
+
+    values = np.r_[portfolio_config['starting_equity'], equity_df['equity'].to_numpy()]
+    peak = np.maximum.accumulate(values)
+    start_equity = float(portfolio_config['starting_equity'])
+    status = trades['status']
+    summary = dict(
+        start_equity=start_equity,
+        end_equity=round(float(equity), 2),
+        return_pct=round(float(equity / start_equity - 1) * 100, 2),
+        max_drawdown_pct=round(float(((peak - values) / peak).max() * 100), 2),
+        trades=int((status == 'closed').sum()),
+        still_open=int((status == 'open').sum()),
+        skipped_positions=int((status == 'skipped - max_positions').sum()),
+        skipped_margin=int((status == 'skipped - margin').sum()),
+        skipped_size=int((status == 'skipped - size').sum()),
+        max_open_positions=max_open,
+        max_margin_used=round(float(max_margin), 2)
+    )
+    # daily equity curve ratios, the per-trade pips ratios are in metrics.compute_metrics
+    daily = metrics.equity_metrics(equity_df, start_equity)
+    summary['sharpe'] = round(daily['sharpe'], 3)
+    summary['sortino'] = round(daily['sortino'], 3)
+    return trades, equity_df, summary
+
+def run_portfolio(pairs, granularity, config=None, portfolio_config=None, ic: InstrumentCollection = None, from_date=None, to_date=None,
+                  fill_config=None, workers=None):
+    """
+    Backtests pairs as one account: each pair's ledger is built in its own worker (candles are
+    never held for more than one pair per process), then simulate replays them together.
+    Trades and the equity curve are pickled to backtesting/results.
+    """
+    config = backtesting.DEFAULT_CONFIG if config is None else config
+    start = time.perf_counter()
+    margin_rates = get_margin_rates(ic, pairs) if ic is not None else None
+
+    ledgers = get_ledgers(pairs, granularity, config, from_date, to_date, fill_config, workers)
+    trades, equity, summary = simulate(ledgers, margin_rates, portfolio_config)
+
+    trades.to_pickle(f"./backtesting/results/portfolio_{granularity}_trades.pkl")
+    equity.to_pickle(f"./backtesting/results/portfolio_{granularity}_equity.pkl")
+    print(f"portfolio of {len(pairs)} pairs on {granularity} in {round(time.perf_counter() - start, 2)}s: {summary}")
+    return trades, equity, summary
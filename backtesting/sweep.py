@@ -0,0 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from backtesting import backtesting
+from backtesting import engine
+from backtesting import fills
+import itertools
+import os
+import time
+import pandas as pd
+
+# config keys that change the technicals columns; everything else only changes the state machine
+TECHNICAL_PARAMS = ['bottom_zone_lookback', 'confirmation_wick_ratio']
+
+def expand_grid(param_ranges, base_config=None):
+    """
+    Turns {"sl_pips": [0, 5], "tp_to_sl_ratio": [0.5, 1, 2], ...} into a list of full config dicts.
+    Keys not in param_ranges keep their value from base_config (DEFAULT_CONFIG by default).
+    """
+    base_config = backtesting.DEFAULT_CONFIG if base_config is None else base_config
+    keys = list(param_ranges.keys())
+    configs = []
+    for values in itertools.product(*[param_ranges[k] for k in keys]):
+        config = dict(base_config)
+        config.update(zip(keys, values))
+        configs.append(config)
+    return configs
+
+def run_sweep(pairs, granularities, param_ranges, from_date=None, to_date=None, workers=None, rank_by='total_pips', base_config=None,
+              keep_ledgers=False, fill_config=None):
+    """
+    Grid-searches the backtest config for every (pair, granularity).
+
+    Each candle file is loaded once, the technicals are computed once per distinct
+    TECHNICAL_PARAMS combination, and the state machine runs are fanned out across
+    worker processes in chunks. Returns a results table sorted by rank_by, best first.
+    With keep_ledgers each row also carries its trade ledger in a 'ledger' column.
+    With fill_config (see fills.DEFAULT_FILLS) every run is repriced on bid/ask, so configs
+    rank on what a long account would have made rather than on mid prices.
+    """
+    configs = expand_grid(param_ranges, base_config)
+    groups = {}
+    for config in configs:
+        groups.setdefault(tuple(config[k] for k in TECHNICAL_PARAMS), []).append(config)
+
+    workers = workers or os.cpu_count() or 1
+    swept = list(param_ranges.keys())
+    start = time.perf_counter()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for pair in pairs:
+            for granularity in granularities:
+                candles = backtesting.load_pair(pair, granularity, from_date, to_date)
+                futures = []
+                for group_configs in groups.values():
+                    df = candles.copy()
+                    backtesting.apply_technicals(df, pair, group_configs[0])
+                    arrays = engine.get_arrays(df)
+                    if fill_config is not None:
+                        arrays.update(fills.get_arrays(df))
+                    times = engine.get_times(df) if keep_ledgers else None
+                    chunk_size = max(1, -(-len(group_configs) // workers))
+                    for i in range(0, len(group_configs), chunk_size):
+                        futures.append(executor.submit(
+                            run_chunk, pair, granularity, arrays, group_configs[i:i + chunk_size], swept, times, keep_ledgers, fill_config
+                        ))
+                for future in as_completed(futures):
+                    results.extend(future.result())
+                print(f"{pair} {granularity} --> {len(configs)} configs swept")
+
+    print(f"{len(results)} runs in {round(time.perf_counter() - start, 2)}s")
+    return rank_results(results, rank_by)
+
+def run_chunk(pair, granularity, arrays, configs, swept, times=None, keep_ledgers=False, fill_config=None):
+    """
+    Worker entry point: runs the state machine for each config over shared technicals arrays.
+    """
+    rows = []
+    for config in configs:
+        ledger, summary = engine.run_ledger(arrays, pair, config, times, fill_config)
+        row = dict(pair=pair, granularity=granularity)
+        row.update({k: config[k] for k in swept})
+        row.update(summary)
+        if keep_ledgers:
+            row['ledger'] = ledger
+        rows.append(row)
+    return rows
+
+def rank_results(results, rank_by='total_pips'):
+    df = pd.DataFrame(results)
+    if df.empty:
+        return df
+    df.sort_values(by=rank_by, ascending=False, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    df.insert(0, 'rank', df.index + 1)
+    return df
@@ -0,0 +1,149 @@
+from concurrent.futures import ProcessPoolExecutor
+from backtesting import backtesting
+from backtesting import engine
+from backtesting import fills
+from backtesting import sweep
+import os
+import time
+import numpy as np
+import pandas as pd
+
+def make_folds(times, in_sample_months=24, out_of_sample_months=6, step_months=None, anchored=False):
+    """
+    Rolling in-sample / out-of-sample windows over a time column. Each fold tunes on
+    in_sample_months and tests on the following out_of_sample_months, the next fold starts
+    step_months later (default out_of_sample_months, so the out-of-sample windows tile).
+    anchored keeps every in-sample window starting at the first candle.
+
+    Folds carry their row ranges (start, end) for slicing the arrays of the full series.
+    """
+    step_months = out_of_sample_months if step_months is None else step_months
+    ns = times.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    first = times.iloc[0]
+    last = times.iloc[-1]
+
+    folds = []
+    is_to = first + pd.DateOffset(months=in_sample_months)
+    while is_to < last:
+        is_from = first if anchored else is_to - pd.DateOffset(months=in_sample_months)
+        oos_to = min(is_to + pd.DateOffset(months=out_of_sample_months), last)
+        bounds = np.searchsorted(ns, [is_from.value, is_to.value, oos_to.value], side='left')
+        folds.append(dict(
+            fold=len(folds),
+            is_from=is_from,
+            is_to=is_to,
+            oos_to=oos_to,
+            is_rows=(int(bounds[0]), int(bounds[1])),
+            # the last fold runs to the end of the series
+            oos_rows=(int(bounds[1]), int(bounds[2]) if oos_to < last else len(ns))
+        ))
+        is_to = is_to + pd.DateOffset(months=step_months)
+    return folds
+
+def slice_arrays(arrays, rows):
+    return {k: v[rows[0]:rows[1]] for k, v in arrays.items()}
+
+def run_out_of_sample(pair, arrays, times, config, fill_config=None):
+    """
+    Worker entry point: one config over one out-of-sample slice, returns (ledger, summary).
+    """
+    return engine.run_ledger(arrays, pair, config, times, fill_config)
+
+def run_walk_forward(pairs, granularities, param_ranges, in_sample_months=24, out_of_sample_months=6, step_months=None,
+                     anchored=False, from_date=None, to_date=None, workers=None, rank_by='total_pips', top_n=1,
+                     base_config=None, fill_config=None):
+    """
+    Walk-forward optimization: for every (pair, granularity) the config grid is swept on each
+    in-sample fold and the top_n configs (by rank_by) are then run on the fold's out-of-sample
+    window.
+
+    The technicals only look back, so they are computed once on the whole series per distinct
+    TECHNICAL_PARAMS combination (through the technicals cache, reused across runs) and every
+    fold slices the same arrays, with no warm-up lost at the fold edges. The in-sample sweeps
+    of all folds go to one process pool together, then the out-of-sample runs. The state
+    machine starts flat at each window.
+
+    Returns (folds, trades): one row per (pair, granularity, fold, rank) with the chosen swept
+    params and is_ / oos_ summaries, and the stitched out-of-sample ledger of the rank 1 configs
+    with positions relative to the whole series.
+    """
+    base_config = backtesting.DEFAULT_CONFIG if base_config is None else base_config
+    configs = sweep.expand_grid(param_ranges, base_config)
+    groups = {}
+    for config in configs:
+        groups.setdefault(tuple(config[k] for k in sweep.TECHNICAL_PARAMS), []).append(config)
+
+    workers = workers or os.cpu_count() or 1
+    swept = list(param_ranges.keys())
+    start = time.perf_counter()
+    fold_rows = []
+    ledgers = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for pair in pairs:
+            for granularity in granularities:
+                candles = backtesting.load_pair(pair, granularity, from_date, to_date)
+                series = {}
+                in_sample = {}
+                for group_key, group_configs in groups.items():
+                    df = candles.copy()
+                    backtesting.apply_technicals(df, pair, group_configs[0])
+                    arrays = engine.get_arrays(df)
+                    if fill_config is not None:
+                        arrays.update(fills.get_arrays(df))
+                    folds = make_folds(df['time'], in_sample_months, out_of_sample_months, step_months, anchored)
+                    series[group_key] = (arrays, engine.get_times(df), folds)
+
+                    chunk_size = max(1, -(-len(group_configs) // workers))
+                    for fold in folds:
+                        fold_arrays = slice_arrays(arrays, fold['is_rows'])
+                        for i in range(0, len(group_configs), chunk_size):
+                            in_sample.setdefault(fold['fold'], []).append(executor.submit(
+                                sweep.run_chunk, pair, granularity, fold_arrays, group_configs[i:i + chunk_size], swept, None, False, fill_config
+                            ))
+
+                folds = next(iter(series.values()))[2]
+                if len(folds) == 0:
+                    print(f"{pair} {granularity} --> not enough history for one fold")
+                    continue
+
+                out_of_sample = []
+                for fold in folds:
+                    results = []
+                    for future in in_sample[fold['fold']]:
+                        results.extend(future.result())
+                    ranked = sweep.rank_results(results, rank_by).head(top_n)
+                    for _, row in ranked.iterrows():
+                        config = dict(base_config)
+                        config.update({k: row[k] for k in swept})
+                        arrays, times, _ = series[tuple(config[k] for k in sweep.TECHNICAL_PARAMS)]
+                        rows = fold['oos_rows']
+                        future = executor.submit(run_out_of_sample, pair, slice_arrays(arrays, rows), times[rows[0]:rows[1]], config, fill_config)
+                        out_of_sample.append((fold, row, future))
+
+                for fold, row, future in out_of_sample:
+                    ledger, summary = future.result()
+                    fold_row = dict(pair=pair, granularity=granularity, fold=fold['fold'], rank=row['rank'],
+                                    is_from=fold['is_from'], is_to=fold['is_to'], oos_to=fold['oos_to'])
+                    fold_row.update({k: row[k] for k in swept})
+                    fold_row.update({f"is_{k}": row[k] for k in summary.keys()})
+                    fold_row.update({f"oos_{k}": v for k, v in summary.items()})
+                    fold_rows.append(fold_row)
+
+                    if row['rank'] == 1:
+                        offset = fold['oos_rows'][0]
+                        ledger['entry_idx'] += offset
+                        ledger['bottom_idx'] += offset
+                        ledger['exit_idx'] = np.where(ledger['exit_idx'] >= 0, ledger['exit_idx'] + offset, -1)
+                        ledgers.append(ledger.assign(pair=pair, granularity=granularity, fold=fold['fold']))
+
+                pair_rows = [r for r in fold_rows if r['pair'] == pair and r['granularity'] == granularity and r['rank'] == 1]
+                print(f"{pair} {granularity} --> {len(folds)} folds, out-of-sample {round(sum(r['oos_total_pips'] for r in pair_rows), 1)} pips "
+                      f"vs in-sample {round(sum(r['is_total_pips'] for r in pair_rows), 1)}")
+
+    folds_df = pd.DataFrame(fold_rows)
+    trades = pd.concat(ledgers, ignore_index=True) if len(ledgers) > 0 else pd.DataFrame()
+    folds_df.to_pickle("./backtesting/results/walk_forward_folds.pkl")
+    trades.to_pickle("./backtesting/results/walk_forward_trades.pkl")
+    print(f"walk forward of {len(configs)} configs in {round(time.perf_counter() - start, 2)}s")
+    return folds_df, trades
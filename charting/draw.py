@@ -4,8 +4,20 @@ from api.oanda_api import OandaApi
 from dateutil import parser
 import timeit
 import plotly.graph_objects as go
+from infrastructure import candle_arrays
+from infrastructure import candle_store
+from infrastructure import schema
+
+def load_chart_candles(pair, granularity, from_date=None, to_date=None):
+    # zero-copy window of the memory mapped candles, sTime is only built for the rows drawn
+    if candle_arrays.has_arrays(pair, granularity) and candle_arrays.is_current(pair, granularity):
+        df = candle_arrays.read_candles(pair, granularity, from_date, to_date)
+    else:
+        df = candle_store.read_candles(pair, granularity, from_date, to_date)
+    return schema.add_stime(df)
 
 def draw_candlestick_chart(df):
+    schema.add_stime(df)
     fig = go.Figure()
 
     fig.add_trace(go.Candlestick(
@@ -64,6 +76,7 @@ def apply_layout(df, fig):
     )
 
 def highlight_downtrend_candles(fig, df, color='blue'):
+    schema.add_stime(df)
     df_downtrend = df[df['in_downtrend'] == True]
 
     fig.add_trace(go.Candlestick(
@@ -80,6 +93,7 @@ def highlight_downtrend_candles(fig, df, color='blue'):
     ))
 
 def highlight_bottom_zones(fig, df, color='yellow'):
+    schema.add_stime(df)
     bottoms = df[df['is_bottom'] == True]
 
     fig.add_trace(go.Candlestick(
@@ -96,6 +110,7 @@ def highlight_bottom_zones(fig, df, color='yellow'):
     ))
 
 def highlight_exits_and_reentries(fig, df, exit_color='red', reentry_color='green'):
+    schema.add_stime(df)
     exits = df[df['setup_stage'] == 'exit']
     reentries = df[df['setup_stage'] == 'reentry']
 
@@ -134,6 +149,7 @@ def highlight_exits_and_reentries(fig, df, exit_color='red', reentry_color='gree
         )
 
 def highlight_strong_bullish_candles(fig, df, color='yellow'):
+    schema.add_stime(df)
     strong_bullish = df[df['strong_bullish'] == True]
 
     fig.add_trace(go.Candlestick(
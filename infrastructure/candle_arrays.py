@@ -0,0 +1,125 @@
+import glob
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from infrastructure import candle_store
+
+ARRAYS_PATH = "./data/arrays"
+
+# layout: {path}/{pair}/{granularity}/{column}.npy, time.npy holds int64 utc nanoseconds and is the index
+def get_dir(pair, granularity, path=ARRAYS_PATH):
+    return f"{path}/{pair}/{granularity}"
+
+def has_arrays(pair, granularity, path=ARRAYS_PATH):
+    return os.path.exists(f"{get_dir(pair, granularity, path)}/meta.json")
+
+def read_meta(pair, granularity, path=ARRAYS_PATH):
+    with open(f"{get_dir(pair, granularity, path)}/meta.json", 'r') as f:
+        return json.loads(f.read())
+
+def write_arrays(df: pd.DataFrame, pair, granularity, path=ARRAYS_PATH, store_mtime=None):
+    """
+    Writes one .npy file per candle column. The directory is built next to the old one and
+    swapped in, so readers never see a half written set. store_mtime records which version
+    of the parquet store the arrays were built from (see is_current).
+    """
+    df = df.drop(columns=['sTime'], errors='ignore').sort_values(by='time')
+    out_dir = get_dir(pair, granularity, path)
+    temp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+
+    times = df['time'].dt.tz_convert('UTC').to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    np.save(f"{temp_dir}/time.npy", times)
+    columns = [c for c in df.columns if c != 'time']
+    for col in columns:
+        np.save(f"{temp_dir}/{col}.npy", np.ascontiguousarray(df[col].to_numpy()))
+
+    meta = dict(
+        rows=len(df),
+        columns=columns,
+        first=str(df['time'].iloc[0]) if len(df) > 0 else None,
+        last=str(df['time'].iloc[-1]) if len(df) > 0 else None,
+        store_mtime=store_mtime
+    )
+    with open(f"{temp_dir}/meta.json", 'w') as f:
+        f.write(json.dumps(meta, indent=2))
+
+    old_dir = f"{out_dir}.{os.getpid()}.old"
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(temp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def is_current(pair, granularity, path=ARRAYS_PATH, store_path=candle_store.STORE_PATH):
+    """
+    False when the parquet store was written after the arrays were built from it, e.g. by
+    data_collection or the downloader, so readers fall back to the store until convert_store runs.
+    """
+    store_mtime = candle_store.latest_mtime(pair, granularity, store_path)
+    if store_mtime is None:
+        return True
+    built_from = read_meta(pair, granularity, path).get('store_mtime')
+    return built_from is not None and store_mtime <= built_from
+
+def open_arrays(pair, granularity, columns=None, path=ARRAYS_PATH):
+    """
+    Memory maps the time index and the requested columns read-only. Nothing is read until
+    it is touched, and every process mapping the same files shares one page cache copy.
+    """
+    directory = get_dir(pair, granularity, path)
+    columns = read_meta(pair, granularity, path)['columns'] if columns is None else columns
+    arrays = {'time': np.load(f"{directory}/time.npy", mmap_mode='r')}
+    for col in columns:
+        if col != 'time':
+            arrays[col] = np.load(f"{directory}/{col}.npy", mmap_mode='r')
+    return arrays
+
+def get_slice(times, from_date=None, to_date=None):
+    # inclusive on both ends like candle_store.read_candles
+    start = 0 if from_date is None else np.searchsorted(times, candle_store.to_utc(from_date).value, side='left')
+    stop = len(times) if to_date is None else np.searchsorted(times, candle_store.to_utc(to_date).value, side='right')
+    return slice(int(start), int(stop))
+
+def read_arrays(pair, granularity, from_date=None, to_date=None, columns=None, path=ARRAYS_PATH):
+    """
+    Same as open_arrays but cut to a date range; the slices are views into the mapped files.
+    """
+    arrays = open_arrays(pair, granularity, columns, path)
+    rows = get_slice(arrays['time'], from_date, to_date)
+    return {col: values[rows] for col, values in arrays.items()}
+
+def to_dataframe(arrays):
+    """
+    Wraps arrays in a DataFrame without copying the price and volume columns. Only the time
+    column is materialized, since pandas copies when making it tz-aware.
+    """
+    data = {'time': pd.Series(arrays['time'].view('datetime64[ns]')).dt.tz_localize('UTC')}
+    for col, values in arrays.items():
+        if col != 'time':
+            data[col] = values
+    return pd.DataFrame(data, copy=False)
+
+def read_candles(pair, granularity, from_date=None, to_date=None, columns=None, path=ARRAYS_PATH):
+    # drop in for candle_store.read_candles
+    return to_dataframe(read_arrays(pair, granularity, from_date, to_date, columns, path))
+
+def convert_store(pairs=None, granularities=None, path=ARRAYS_PATH, store_path=candle_store.STORE_PATH):
+    """
+    Builds the memory mapped arrays from the parquet candle store.
+    """
+    for pair_dir in sorted(glob.glob(f"{store_path}/*")):
+        pair = os.path.basename(pair_dir)
+        if pairs is not None and pair not in pairs:
+            continue
+        for granularity_dir in sorted(glob.glob(f"{pair_dir}/*")):
+            granularity = os.path.basename(granularity_dir)
+            if granularities is not None and granularity not in granularities:
+                continue
+            # taken before the read, so a write racing the conversion leaves the arrays stale
+            store_mtime = candle_store.latest_mtime(pair, granularity, store_path)
+            df = candle_store.read_candles(pair, granularity, path=store_path)
+            write_arrays(df, pair, granularity, path, store_mtime)
+            print(f"{pair} {granularity} --> {df.shape[0]} candles mapped")
@@ -0,0 +1,132 @@
+import glob
+import os
+import pandas as pd
+from infrastructure import schema
+
+STORE_PATH = "./data/store"
+
+# layout: {path}/{pair}/{granularity}/{year}.parquet
+def get_partition_dir(pair, granularity, path=STORE_PATH):
+    return f"{path}/{pair}/{granularity}"
+
+def get_partition_file(pair, granularity, year, path=STORE_PATH):
+    return f"{get_partition_dir(pair, granularity, path)}/{year}.parquet"
+
+def list_years(pair, granularity, path=STORE_PATH):
+    files = glob.glob(f"{get_partition_dir(pair, granularity, path)}/*.parquet")
+    return sorted(int(os.path.basename(f).split('.')[0]) for f in files)
+
+def has_candles(pair, granularity, path=STORE_PATH):
+    return len(list_years(pair, granularity, path)) > 0
+
+def latest_mtime(pair, granularity, path=STORE_PATH):
+    # newest modification time of any year partition, None when nothing is stored
+    files = glob.glob(f"{get_partition_dir(pair, granularity, path)}/*.parquet")
+    return max(os.path.getmtime(f) for f in files) if len(files) > 0 else None
+
+def last_timestamp(pair, granularity, path=STORE_PATH):
+    # only the newest year file's time column is read
+    years = list_years(pair, granularity, path)
+    if len(years) == 0:
+        return None
+    times = pd.read_parquet(get_partition_file(pair, granularity, years[-1], path), columns=['time'])['time']
+    return times.max() if len(times) > 0 else None
+
+def write_candles(df: pd.DataFrame, pair, granularity, path=STORE_PATH):
+    """
+    Merges candles into the store. Only the year partitions touched by df are rewritten;
+    rows are deduplicated on 'time' (new rows win) and kept sorted.
+    """
+    if df is None or df.empty:
+        return
+
+    df = df.drop(columns=['sTime'], errors='ignore')
+    os.makedirs(get_partition_dir(pair, granularity, path), exist_ok=True)
+
+    for year, year_df in df.groupby(df['time'].dt.year):
+        file_name = get_partition_file(pair, granularity, year, path)
+        if os.path.exists(file_name):
+            year_df = pd.concat([pd.read_parquet(file_name), year_df])
+
+        year_df = year_df.drop_duplicates(subset=['time'], keep='last')
+        year_df = year_df.sort_values(by='time').reset_index(drop=True)
+
+        temp_name = f"{file_name}.tmp"
+        year_df.to_parquet(temp_name, index=False)
+        os.replace(temp_name, file_name)
+
+def read_candles(pair, granularity, from_date=None, to_date=None, columns=None, path=STORE_PATH):
+    """
+    Reads candles for a pair/granularity, optionally limited to a date range and a subset
+    of columns. Only the year files overlapping the range are opened, and the range and
+    column selection are pushed down to the parquet reader. Both ends of the range are inclusive.
+    """
+    years = list_years(pair, granularity, path)
+    start = to_utc(from_date) if from_date is not None else None
+    end = to_utc(to_date) if to_date is not None else None
+
+    if start is not None:
+        years = [y for y in years if y >= start.year]
+    if end is not None:
+        years = [y for y in years if y <= end.year]
+    if len(years) == 0:
+        return empty_candles(columns)
+
+    if columns is not None and 'time' not in columns:
+        columns = ['time'] + list(columns)
+
+    filters = []
+    if start is not None:
+        filters.append(('time', '>=', start))
+    if end is not None:
+        filters.append(('time', '<=', end))
+
+    dfs = [
+        pd.read_parquet(
+            get_partition_file(pair, granularity, y, path),
+            columns=columns,
+            filters=filters if len(filters) > 0 else None
+        )
+        for y in years
+    ]
+    return pd.concat(dfs, ignore_index=True)
+
+def empty_candles(columns=None):
+    # zero rows in the candles_to_df schema, so column lookups downstream still work
+    df = pd.DataFrame({
+        'time': pd.Series([], dtype='datetime64[ns, UTC]'),
+        'volume': pd.Series([], dtype='int64'),
+        **{col: pd.Series([], dtype='float64') for col in schema.PRICE_COLUMNS}
+    })
+    if columns is not None:
+        df = df[['time'] + [c for c in columns if c != 'time']]
+    return df
+
+def to_utc(date):
+    # candle times are stored as UTC, naive dates are taken to be UTC as well
+    ts = pd.Timestamp(date)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+def seed_from_pickle(pair, granularity, data_path='./data', path=STORE_PATH):
+    """
+    Writes the old {pair}_{granularity}.pkl history into an empty store. Returns True when
+    there was a pickle to seed from.
+    """
+    file_name = f"{data_path}/{pair}_{granularity}.pkl"
+    if not os.path.exists(file_name):
+        return False
+    df = pd.read_pickle(file_name)
+    write_candles(df, pair, granularity, path)
+    print(f"{pair} {granularity} --> store seeded with {df.shape[0]} candles from {file_name}")
+    return df.shape[0] > 0
+
+def convert_pickles(data_path='./data', path=STORE_PATH):
+    """
+    One-shot converter from the old {pair}_{granularity}.pkl files in data_path into the store.
+    """
+    for file_name in sorted(glob.glob(f"{data_path}/*_*_*.pkl")):
+        pair_granularity = os.path.basename(file_name)[:-len('.pkl')]
+        pair, granularity = pair_granularity.rsplit('_', 1)
+        df = pd.read_pickle(file_name)
+        write_candles(df, pair, granularity, path)
+        print(f"{pair} {granularity} --> {df.shape[0]} candles converted")
@@ -2,6 +2,7 @@ import pandas as pd
 import datetime as dt
 from dateutil import parser
 from infrastructure.instrument_collection import InstrumentCollection
+from infrastructure import candle_store
 from api.oanda_api import OandaApi
 
 CANDLE_COUNT = 3000
@@ -16,21 +17,16 @@ INCREMENTS = {
     'D': 1440 * CANDLE_COUNT
 }
 
-# saves panda dataframe to pkl file
-def save_file(final_df: pd.DataFrame, file_prefix, granularity, pair):
-    file_name = f"{file_prefix}{pair}_{granularity}.pkl"
+# merges panda dataframe into the parquet candle store
+def save_file(final_df: pd.DataFrame, granularity, pair):
+    candle_store.write_candles(final_df, pair, granularity)
 
-    final_df.drop_duplicates(subset=['time'], inplace=True)
-    final_df.sort_values(by='time', inplace=True)
-    final_df.reset_index(drop=True, inplace=True)
-    final_df.to_pickle(file_name)
-
-# makes call to api and gathers candle data into dataframe
-def fetch_candles(pair, granularity, from_date: dt.datetime, to_date: dt.datetime, api: OandaApi):
+# makes call to api and gathers candle data into dataframe, None when every attempt failed
+def fetch_candles(pair, granularity, from_date: dt.datetime, to_date: dt.datetime, api: OandaApi, attempts=3):
     fetch_attempts = 0
-    candles_df = pd.DataFrame()
+    candles_df = None
 
-    while fetch_attempts < 3:
+    while fetch_attempts < attempts:
         candles_df = api.get_candles_df(
             pair,
             granularity=granularity,
@@ -41,21 +37,21 @@ def fetch_candles(pair, granularity, from_date: dt.datetime, to_date: dt.datetim
         if candles_df is not None:
             break
 
-        attempts += 1
+        fetch_attempts += 1
 
-    if candles_df is not None and candles_df.empty == False:
-        return candles_df
-    else:
-        return None
-    
-def collect_data(pair, granularity, from_date, to_date, api: OandaApi):
-    print('collect data called')
+    return candles_df
+
+def fetch_range(pair, granularity, from_date: dt.datetime, end_date: dt.datetime, api: OandaApi):
+    """
+    Fetches [from_date, to_date] in INCREMENTS sized windows.
+
+    Returns (candle_dfs, failed) where failed lists the (pair, granularity, from, to) windows
+    whose requests still failed after retrying, as downloader.download reports them.
+    """
     time_step = INCREMENTS[granularity]
-    end_date = parser.parse(to_date)
-    from_date = parser.parse(from_date)
     candle_dfs = []
+    failed = []
     to_date = from_date
-    file_prefix = "./data/"
 
     while to_date < end_date:
         to_date = from_date + dt.timedelta(minutes=time_step)
@@ -70,7 +66,10 @@ def collect_data(pair, granularity, from_date, to_date, api: OandaApi):
             api
         )
 
-        if candles is not None:
+        if candles is None:
+            failed.append((pair, granularity, from_date, to_date))
+            print(f"*** FAILED {pair} {granularity} {from_date} {to_date}")
+        elif not candles.empty:
             candle_dfs.append(candles)
             print(f"{pair} {granularity} {from_date} {to_date} --> {candles.shape[0]} candles loaded")
         else:
@@ -78,15 +77,127 @@ def collect_data(pair, granularity, from_date, to_date, api: OandaApi):
 
         from_date = to_date
 
+    return candle_dfs, failed
+
+def collect_data(pair, granularity, from_date, to_date, api: OandaApi):
+    """
+    Fetches [from_date, to_date] into the candle store, to_date None collects up to now.
+    Returns the windows that failed (see fetch_range).
+    """
+    print('collect data called')
+    end_date = parser.parse(to_date) if to_date is not None else dt.datetime.now(dt.timezone.utc)
+    candle_dfs, failed = fetch_range(pair, granularity, parser.parse(from_date), end_date, api)
+
     if len(candle_dfs) > 0:
         final_df = pd.concat(candle_dfs)
-        final_df['sTime'] = [dt.datetime.strftime(x, "s%y-%m-%d %H:%M") for x in final_df.time]
-        save_file(final_df, file_prefix, granularity, pair)
+        save_file(final_df, granularity, pair)
         print(f"{pair} {granularity} --> DATA SAVED!")
     else:
         print(f"{pair} {granularity} --> NO DATA SAVED!")
+    return failed
+
+def is_market_closed(times: pd.DatetimeIndex):
+    """
+    True for times inside the weekly FX close (Fri 21:00 - Sun 22:00 UTC, wide enough to cover DST)
+    or the Christmas / New Year closes, where missing candles are expected.
+    """
+    weekday = times.weekday
+    hour = times.hour
+    holiday_eve = (times.month == 12) & ((times.day == 24) | (times.day == 31)) & (hour >= 21)
+    holiday = ((times.month == 12) & (times.day == 25)) | ((times.month == 1) & (times.day == 1))
+    # holidays falling on a sunday are observed until the monday evening open
+    observed = (weekday == 0) & (hour < 22) & (
+        ((times.month == 12) & (times.day == 26)) | ((times.month == 1) & (times.day == 2))
+    )
+    return (
+        ((weekday == 4) & (hour >= 21)) |
+        (weekday == 5) |
+        ((weekday == 6) & (hour < 22)) |
+        holiday_eve |
+        holiday |
+        observed
+    )
+
+def find_gaps(times: pd.Series, granularity, min_gap=dt.timedelta(hours=1)):
+    """
+    Finds interior gaps in a sorted series of candle times. A gap is reported when the
+    trading time missing between two stored candles (weekends/holidays excluded) is at least
+    min_gap or one candle, whichever is longer.
+
+    Returns list of (from_date, to_date) tuples bounded by the stored candles on either side.
+    """
+    step = dt.timedelta(minutes=INCREMENTS[granularity] // CANDLE_COUNT)
+    min_gap = max(min_gap, step)
+    times = times.reset_index(drop=True)
+    diffs = times.diff()
+
+    gaps = []
+    for i in diffs.index[diffs > min_gap]:
+        start = times[i - 1]
+        end = times[i]
+        expected = pd.date_range(start + step, end - step, freq=step)
+        missing = (~is_market_closed(expected)).sum() * step
+        if missing >= min_gap:
+            gaps.append((start.to_pydatetime(), end.to_pydatetime()))
+    return gaps
+
+def merge_windows(windows, granularity):
+    # joins nearby gaps so each api window covers as many of them as it can
+    max_span = dt.timedelta(minutes=INCREMENTS[granularity])
+    merged = []
+    for start, end in windows:
+        if merged and end - merged[-1][0] <= max_span:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def update_data(pair, granularity, from_date, to_date, api: OandaApi, fill_gaps=True):
+    """
+    Incremental collection: fetches only candles newer than the last stored one and, when
+    fill_gaps is set, re-fetches interior gaps. New rows are merged into the candle store,
+    so only the year partitions they fall into are rewritten.
+    An empty store is seeded from the old ./data/{pair}_{granularity}.pkl when there is one,
+    otherwise it falls back to collect_data. to_date None updates up to now.
+
+    Returns the windows that failed (see fetch_range); their gaps are found again next run.
+    """
+    last_time = candle_store.last_timestamp(pair, granularity)
+    if last_time is None and candle_store.seed_from_pickle(pair, granularity):
+        last_time = candle_store.last_timestamp(pair, granularity)
+    if last_time is None:
+        return collect_data(pair, granularity, from_date, to_date, api)
+
+    end_date = parser.parse(to_date) if to_date is not None else dt.datetime.now(dt.timezone.utc)
+    windows = []
+    if fill_gaps:
+        times = candle_store.read_candles(pair, granularity, columns=['time'])['time']
+        windows = merge_windows(find_gaps(times, granularity), granularity)
+        print(f"{pair} {granularity} --> {len(windows)} gap window(s) to fill")
+
+    candle_dfs = []
+    failed = []
+    for start, end in windows:
+        dfs, window_failed = fetch_range(pair, granularity, start, end, api)
+        candle_dfs.extend(dfs)
+        failed.extend(window_failed)
+
+    if last_time.to_pydatetime() < end_date:
+        dfs, window_failed = fetch_range(pair, granularity, last_time.to_pydatetime(), end_date, api)
+        candle_dfs.extend(dfs)
+        failed.extend(window_failed)
+
+    if len(candle_dfs) > 0:
+        final_df = pd.concat(candle_dfs)
+        save_file(final_df, granularity, pair)
+        print(f"{pair} {granularity} --> {final_df.shape[0]} candles merged, DATA SAVED!")
+    elif len(failed) == 0:
+        print(f"{pair} {granularity} --> UP TO DATE")
+    if len(failed) > 0:
+        print(f"*** {pair} {granularity} --> {len(failed)} window(s) FAILED")
+    return failed
 
-def run_collection(ic: InstrumentCollection, api: OandaApi, granularities):
+def run_collection(ic: InstrumentCollection, api: OandaApi, granularities, incremental=False):
     print('running data collection...')
     # currencies = ['AUD', 'CAD', 'USD', 'EUR', 'JPY', 'GBP', 'NZD', 'CHF']
     pairs = ["AUD_USD", "EUR_USD", "GBP_USD", "USD_CHF", "USD_JPY", "NZD_USD", "USD_CAD"]
@@ -100,6 +211,15 @@ def run_collection(ic: InstrumentCollection, api: OandaApi, granularities):
         if pair in ic.instrument_dict.keys():
             for g in granularities:
                 print(f'running collection for {pair}_{g}...')
+                if incremental:
+                    update_data(
+                        pair,
+                        g,
+                        from_date,
+                        None,
+                        api
+                    )
+                    continue
                 collect_data(
                     pair,
                     g,
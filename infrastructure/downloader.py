@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import datetime as dt
+import pandas as pd
+from dateutil import parser
+from infrastructure.instrument_collection import InstrumentCollection
+from infrastructure.data_collection import INCREMENTS
+from infrastructure import candle_store
+from api.oanda_api import OandaApi
+from api.rate_limiter import TokenBucket
+
+# oanda rest limit is 120 requests per second, stay a little under it
+DEFAULT_RATE = 100
+
+def build_windows(granularity, from_date: dt.datetime, end_date: dt.datetime):
+    step = dt.timedelta(minutes=INCREMENTS[granularity])
+    windows = []
+    while from_date < end_date:
+        to_date = min(from_date + step, end_date)
+        windows.append((from_date, to_date))
+        from_date = to_date
+    return windows
+
+def fetch_window(api: OandaApi, pair, granularity, from_date, to_date):
+    # None means the request failed, an empty dataframe means the window had no candles
+    data = api.fetch_candles(pair, granularity=granularity, from_date=from_date, to_date=to_date)
+    if data is None:
+        return None
+    return api.candles_to_df(data)
+
+def download(api: OandaApi, jobs, workers=8, on_complete=None):
+    """
+    Downloads many (pair, granularity, from_date, to_date) jobs at once by splitting each into
+    INCREMENTS sized windows and fetching the windows on a thread pool.
+
+    As soon as every window of a job is back its candles are concatenated in window order,
+    deduplicated on 'time' and passed to on_complete(pair, granularity, df). Without a callback
+    the frames are returned as {(pair, granularity): df}.
+
+    Returns (results, failed) where failed lists the (pair, granularity, from, to) windows that errored.
+    """
+    tasks = []
+    for pair, granularity, from_date, to_date in jobs:
+        for i, (start, end) in enumerate(build_windows(granularity, from_date, to_date)):
+            tasks.append((pair, granularity, i, start, end))
+
+    remaining = {}
+    for pair, granularity, _, _, _ in tasks:
+        remaining[(pair, granularity)] = remaining.get((pair, granularity), 0) + 1
+
+    parts = {key: {} for key in remaining}
+    results = {}
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(fetch_window, api, pair, granularity, start, end): (pair, granularity, i, start, end)
+            for pair, granularity, i, start, end in tasks
+        }
+        for future in as_completed(futures):
+            pair, granularity, i, start, end = futures[future]
+            key = (pair, granularity)
+            df = future.result()
+            if df is None:
+                failed.append((pair, granularity, start, end))
+            elif not df.empty:
+                parts[key][i] = df
+
+            remaining[key] -= 1
+            if remaining[key] > 0:
+                continue
+
+            job_parts = parts.pop(key)
+            if len(job_parts) == 0:
+                print(f"{pair} {granularity} --> NO CANDLES")
+                continue
+
+            final_df = pd.concat([job_parts[n] for n in sorted(job_parts)], ignore_index=True)
+            final_df = final_df.drop_duplicates(subset=['time']).sort_values(by='time').reset_index(drop=True)
+            print(f"{pair} {granularity} --> {final_df.shape[0]} candles downloaded")
+            if on_complete is not None:
+                on_complete(pair, granularity, final_df)
+            else:
+                results[key] = final_df
+
+    for pair, granularity, start, end in failed:
+        print(f"*** FAILED {pair} {granularity} {start} {end}")
+
+    return results, failed
+
+def run_collection(ic: InstrumentCollection, granularities, pairs=None, from_date='2015-01-01T00:00:00Z', to_date='2025-01-01T00:00:00Z',
+                   workers=8, rate=DEFAULT_RATE, max_retries=5, base_url=None):
+    """
+    Concurrent version of data_collection.run_collection: downloads every pair x granularity
+    through one pooled, rate limited api and merges each into the candle store as it finishes.
+    """
+    print('running concurrent data collection...')
+    pairs = ["AUD_USD", "EUR_USD", "GBP_USD", "USD_CHF", "USD_JPY", "NZD_USD", "USD_CAD"] if pairs is None else pairs
+    api = OandaApi(base_url=base_url, pool_size=workers, rate_limiter=TokenBucket(rate), max_retries=max_retries)
+
+    start = parser.parse(from_date)
+    end = parser.parse(to_date)
+    jobs = []
+    for pair in pairs:
+        if pair not in ic.instrument_dict.keys():
+            print(f'{pair} not found in instument collection')
+            continue
+        for g in granularities:
+            jobs.append((pair, g, start, end))
+
+    def save(pair, granularity, df):
+        candle_store.write_candles(df, pair, granularity)
+
+    return download(api, jobs, workers=workers, on_complete=save)
@@ -0,0 +1,225 @@
+from abc import ABC, abstractmethod
+import asyncio
+import datetime as dt
+import json
+import os
+import pandas as pd
+from api.oanda_api import OandaApi
+from backtesting.backtesting import DEFAULT_CONFIG
+from backtesting.engine import PairStateMachine, STAGE_LABELS
+from infrastructure.data_collection import INCREMENTS, CANDLE_COUNT
+from infrastructure.downloader import build_windows
+from technicals.streaming import TechnicalsEngine
+
+STATE_FILE = "./data/live_state.json"
+
+class Broker(ABC):
+    """
+    Interface the live runner sends orders to. Prices are mid prices from the strategy.
+    A subclass missing any of the methods fails when it is created.
+    """
+    @abstractmethod
+    def open_trade(self, pair, time, entry_price, stop_loss, take_profit):
+        pass
+
+    @abstractmethod
+    def update_stop(self, pair, time, stop_loss):
+        pass
+
+    @abstractmethod
+    def close_trade(self, pair, time, exit_price, pips):
+        pass
+
+class SimulatedBroker(Broker):
+    """
+    Local paper broker: keeps open positions in memory and logs every order.
+    """
+    def __init__(self):
+        self.positions = {}
+        self.orders = []
+
+    def _log(self, action, pair, time, **kwargs):
+        order = dict(action=action, pair=pair, time=time, **kwargs)
+        self.orders.append(order)
+        print(f"[SIM] {order}")
+
+    def open_trade(self, pair, time, entry_price, stop_loss, take_profit):
+        self.positions[pair] = dict(entry_price=entry_price, stop_loss=stop_loss, take_profit=take_profit)
+        self._log('open', pair, time, entry_price=entry_price, stop_loss=stop_loss, take_profit=take_profit)
+
+    def update_stop(self, pair, time, stop_loss):
+        if pair in self.positions:
+            self.positions[pair]['stop_loss'] = stop_loss
+        self._log('update_stop', pair, time, stop_loss=stop_loss)
+
+    def close_trade(self, pair, time, exit_price, pips):
+        self.positions.pop(pair, None)
+        self._log('close', pair, time, exit_price=exit_price, pips=pips)
+
+class LiveRunner:
+    """
+    Polls completed candles for many pairs concurrently and advances a PairStateMachine per pair,
+    sending the resulting orders to a Broker.
+
+    Each pair waits until its next candle is due to close, then polls every poll_interval seconds
+    until oanda reports it complete, so decisions follow the close by roughly one poll interval
+    plus one request. State machines and the last processed candle time are saved to state_file
+    after every candle; on restart technicals are rebuilt from the history candles ending at
+    the saved candle, and every candle that closed while the runner was down, however long that
+    was, is fetched in INCREMENTS sized windows and replayed into the state machines without
+    sending orders. Only candles closing after startup are traded. A trade the replay opened was
+    never sent, so its later stop updates and close are not sent either.
+    """
+    def __init__(self, api: OandaApi, pairs, granularity, broker: Broker, config=None,
+                 state_file=STATE_FILE, poll_interval=1.0, history=500):
+        self.api = api
+        self.pairs = pairs
+        self.granularity = granularity
+        self.broker = broker
+        self.config = DEFAULT_CONFIG if config is None else config
+        self.state_file = state_file
+        self.poll_interval = poll_interval
+        self.history = history
+        self.step = dt.timedelta(minutes=INCREMENTS[granularity] // CANDLE_COUNT)
+
+        self.machines = {}
+        self.technicals = {}
+        self.last_times = {}
+        # pairs whose open trade was opened during a replay and never sent to the broker
+        self.unsent = set()
+        self.latencies = {pair: [] for pair in pairs}
+
+    def load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file, 'r') as f:
+            return json.loads(f.read())
+
+    def save_state(self):
+        data = {
+            pair: dict(last_time=self.last_times[pair].isoformat(), machine=self.machines[pair].get_state(),
+                       unsent=pair in self.unsent)
+            for pair in self.machines if pair in self.last_times
+        }
+        temp_name = f"{self.state_file}.tmp"
+        with open(temp_name, 'w') as f:
+            f.write(json.dumps(data, indent=2))
+        os.replace(temp_name, self.state_file)
+
+    async def fetch_candles(self, pair, count):
+        df = await asyncio.to_thread(
+            self.api.get_candles_df, pair, components=['mid'], granularity=self.granularity, count=count
+        )
+        return df
+
+    async def fetch_range(self, pair, from_date, to_date):
+        # completed candles between from_date and to_date, one request per INCREMENTS window
+        frames = []
+        for start, end in build_windows(self.granularity, from_date, to_date):
+            df = await asyncio.to_thread(
+                self.api.get_candles_df, pair, components=['mid'], granularity=self.granularity, from_date=start, to_date=end
+            )
+            if df is None:
+                raise ValueError(f"candle request failed for {pair} {start} {end}")
+            frames.append(df)
+        frames = [df for df in frames if not df.empty]
+        if len(frames) == 0:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).drop_duplicates(subset=['time']).sort_values(by='time').reset_index(drop=True)
+
+    async def start_pair(self, pair, saved):
+        self.machines[pair] = PairStateMachine(pair, self.config)
+        self.technicals[pair] = TechnicalsEngine.from_config(self.config)
+
+        if pair in saved:
+            self.machines[pair].load_state(saved[pair]['machine'])
+            if saved[pair].get('unsent', False):
+                self.unsent.add(pair)
+            last_time = pd.Timestamp(saved[pair]['last_time'])
+            # the warm-up ends at the saved candle, widened for weekends and holidays
+            span = self.step * self.history * 7 / 5 + dt.timedelta(days=5)
+            history = await self.fetch_range(pair, (last_time - span).to_pydatetime(), (last_time + self.step).to_pydatetime())
+            history = history[history['time'] <= last_time].tail(self.history) if not history.empty else history
+            if len(history) < self.history:
+                print(f"*** {pair} only {len(history)} of {self.history} warm-up candles before {last_time}")
+            self.technicals[pair].warm_up(history)
+            self.last_times[pair] = last_time
+            # catch up on candles that closed while we were down, their signals are stale so nothing is sent
+            missed = await self.fetch_range(pair, (last_time + self.step).to_pydatetime(), dt.datetime.now(dt.timezone.utc))
+            missed = missed[missed['time'] > last_time].to_dict('records') if not missed.empty else []
+            for candle in missed:
+                self.process_candle(pair, candle, send_orders=False)
+            if len(missed) > 0:
+                print(f"{pair} replayed {len(missed)} missed candle(s) without orders")
+        else:
+            history = await self.fetch_candles(pair, self.history)
+            if history is None or history.empty:
+                raise ValueError(f"no candle history for {pair}")
+            self.technicals[pair].warm_up(history)
+            self.last_times[pair] = history['time'].iloc[-1]
+        print(f"{pair} live from {self.last_times[pair]}")
+
+    def process_candle(self, pair, candle, send_orders=True):
+        technicals = self.technicals[pair].update(candle)
+        self.last_times[pair] = candle['time']
+        if technicals is None:
+            return
+
+        machine = self.machines[pair]
+        stop_before = machine.trade_stop_loss
+        row = machine.step(candle, technicals)
+
+        if not send_orders:
+            sent_trade = pair not in self.unsent and row['trade'] != 'opened'
+            if sent_trade and (row['trade'] == 'closed - sl' or (machine.in_trade and machine.trade_stop_loss != stop_before)):
+                # a trade sent before the restart moved while we were down, the broker side needs checking by hand
+                print(f"{pair} {candle['time']} sent trade {row['trade'] or 'stop moved'} during replay, not sent")
+            if row['trade'] == 'opened':
+                self.unsent.add(pair)
+            if not machine.in_trade:
+                self.unsent.discard(pair)
+            return
+        if pair in self.unsent:
+            if not machine.in_trade:
+                self.unsent.discard(pair)
+            return
+
+        if row['trade'] == 'opened':
+            self.broker.open_trade(pair, candle['time'], row['entry_price'], machine.trade_stop_loss, row['take_profit'])
+        if row['trade'] == 'closed - sl':
+            self.broker.close_trade(pair, candle['time'], machine.trade_stop_loss, row['pips'])
+        elif machine.in_trade and row['trade'] is None and machine.trade_stop_loss != stop_before:
+            self.broker.update_stop(pair, candle['time'], machine.trade_stop_loss)
+
+    async def run_pair(self, pair, stop_event: asyncio.Event):
+        while not stop_event.is_set():
+            # candle times are open times, the next one completes two steps after the last seen open
+            close_time = self.last_times[pair] + 2 * self.step
+            wait = (close_time - pd.Timestamp.now(tz='UTC')).total_seconds()
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=wait)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+
+            candles = await self.fetch_candles(pair, 3)
+            # None is a failed request, polled again like a candle that is not complete yet
+            new_candles = candles[candles['time'] > self.last_times[pair]] if candles is not None and not candles.empty else None
+            if new_candles is None or new_candles.empty:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            for candle in new_candles.to_dict('records'):
+                self.process_candle(pair, candle)
+                latency = (pd.Timestamp.now(tz='UTC') - (candle['time'] + self.step)).total_seconds()
+                self.latencies[pair].append(latency)
+            self.save_state()
+            print(f"{pair} {self.last_times[pair]} stage={STAGE_LABELS[self.machines[pair].current_stage]} latency={round(latency, 3)}s")
+
+    async def run(self, stop_event: asyncio.Event = None):
+        stop_event = asyncio.Event() if stop_event is None else stop_event
+        saved = self.load_state()
+        await asyncio.gather(*[self.start_pair(pair, saved) for pair in self.pairs])
+        self.save_state()
+        await asyncio.gather(*[self.run_pair(pair, stop_event) for pair in self.pairs])
@@ -0,0 +1,139 @@
+import os
+import numpy as np
+import pandas as pd
+from infrastructure import candle_store
+from infrastructure.data_collection import INCREMENTS, CANDLE_COUNT
+
+RESAMPLED_PATH = "./data/resampled"
+BASE_GRANULARITY = 'M5'
+
+# oanda aligns H4 and D candles to 17:00 new york time, smaller granularities to the utc clock
+ALIGNMENT_TZ = 'America/New_York'
+ALIGNMENT_HOUR = 17
+ALIGNED = ['H4', 'D']
+
+PRICE_PREFIXES = ['mid', 'bid', 'ask']
+MINUTE_NS = 60 * 10**9
+
+def get_minutes(granularity):
+    return INCREMENTS[granularity] // CANDLE_COUNT
+
+def bucket_keys(times: pd.Series, granularity):
+    """
+    Returns (keys, offsets): a sortable bucket start per row in int64 nanoseconds and the offset
+    from utc the key is expressed in. Aligned granularities are bucketed on new york wall clock
+    time so they follow daylight saving, the rest on utc (offset 0).
+    """
+    times = times.dt.tz_convert('UTC')
+    utc_ns = times.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    step = get_minutes(granularity) * MINUTE_NS
+
+    if granularity not in ALIGNED:
+        return utc_ns // step * step, np.zeros(len(utc_ns), dtype=np.int64)
+
+    local_ns = times.dt.tz_convert(ALIGNMENT_TZ).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    anchor = ALIGNMENT_HOUR * 60 * MINUTE_NS
+    return (local_ns - anchor) // step * step + anchor, local_ns - utc_ns
+
+def resample_candles(df: pd.DataFrame, granularity, complete_only=False):
+    """
+    Builds granularity candles from a finer, time sorted candle frame in the get_candles_df schema.
+    Every mid/bid/ask price set present is aggregated (first open, max high, min low, last close)
+    and volume is summed. Candle times are bucket open times in UTC.
+
+    complete_only drops the last candle if the source does not reach the end of its bucket yet.
+    """
+    df = df.drop(columns=['sTime'], errors='ignore')
+    if df.empty:
+        return df
+
+    keys, offsets = bucket_keys(df['time'], granularity)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    # a bucket is labelled with its start in utc, using the offset of its first row
+    labels = keys[starts] - offsets[starts]
+
+    data = {'time': pd.to_datetime(labels, utc=True)}
+    if 'volume' in df.columns:
+        data['volume'] = np.add.reduceat(df['volume'].to_numpy(), starts)
+    for p in PRICE_PREFIXES:
+        if f"{p}_o" not in df.columns:
+            continue
+        data[f"{p}_o"] = df[f"{p}_o"].to_numpy()[starts]
+        data[f"{p}_h"] = np.maximum.reduceat(df[f"{p}_h"].to_numpy(), starts)
+        data[f"{p}_l"] = np.minimum.reduceat(df[f"{p}_l"].to_numpy(), starts)
+        data[f"{p}_c"] = df[f"{p}_c"].to_numpy()[ends]
+    result = pd.DataFrame(data)
+
+    if complete_only and len(df) > 1:
+        utc_ns = df['time'].dt.tz_convert('UTC').to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        source_step = np.min(np.diff(utc_ns))
+        bucket_end = labels[-1] + get_minutes(granularity) * MINUTE_NS
+        if utc_ns[-1] + source_step < bucket_end:
+            result = result.iloc[:-1]
+
+    return result
+
+def has_base(pair, base=BASE_GRANULARITY, base_path=candle_store.STORE_PATH):
+    return candle_store.has_candles(pair, base, base_path)
+
+def get_mtime(file_name):
+    return os.path.getmtime(file_name) if os.path.exists(file_name) else None
+
+def stale_years(pair, granularity, base=BASE_GRANULARITY, path=RESAMPLED_PATH, base_path=candle_store.STORE_PATH):
+    """
+    Cached years older than the base partitions they are built from. The last candle of a year
+    can take rows from the first hours of the next one, so that base year counts too.
+    """
+    years = candle_store.list_years(pair, base, base_path)
+    stale = []
+    for year in years:
+        cached = get_mtime(candle_store.get_partition_file(pair, granularity, year, path))
+        sources = [get_mtime(candle_store.get_partition_file(pair, base, y, base_path)) for y in [year, year + 1]]
+        if cached is None or any(s is not None and s > cached for s in sources):
+            stale.append(year)
+    return stale
+
+def update_cache(pair, granularity, base=BASE_GRANULARITY, path=RESAMPLED_PATH, base_path=candle_store.STORE_PATH):
+    # only stale years are rebuilt, each from its own base year plus the start of the next
+    for year in stale_years(pair, granularity, base, path, base_path):
+        start = pd.Timestamp(year=year, month=1, day=1, tz='UTC')
+        end = pd.Timestamp(year=year + 1, month=1, day=2, tz='UTC')
+        base_df = candle_store.read_candles(pair, base, start, end, path=base_path)
+        df = resample_candles(base_df, granularity)
+        df = df[df['time'].dt.year == year] if not df.empty else df
+        candle_store.write_candles(df, pair, granularity, path)
+        print(f"{pair} {granularity} {year} --> {df.shape[0]} candles resampled from {base}")
+
+def get_candles(pair, granularity, from_date=None, to_date=None, columns=None, base=BASE_GRANULARITY,
+                path=RESAMPLED_PATH, base_path=candle_store.STORE_PATH):
+    """
+    Reads granularity candles derived from the stored base series, same arguments as
+    candle_store.read_candles. Resampled years are cached in path and rebuilt when their
+    base partitions change.
+    """
+    if granularity == base:
+        return candle_store.read_candles(pair, base, from_date, to_date, columns, base_path)
+    if get_minutes(granularity) <= get_minutes(base) or get_minutes(granularity) % get_minutes(base) != 0:
+        raise ValueError(f"cannot resample {base} into {granularity}")
+
+    update_cache(pair, granularity, base, path, base_path)
+    return candle_store.read_candles(pair, granularity, from_date, to_date, columns, path)
+
+def join_timeframes(df: pd.DataFrame, higher_df: pd.DataFrame, granularity, columns=None, suffix=None):
+    """
+    Attaches the last completed higher granularity candle to every row of df. A higher candle
+    only becomes visible once it has closed, so the join never looks ahead.
+    """
+    suffix = f"_{granularity}" if suffix is None else suffix
+    columns = [c for c in higher_df.columns if c != 'time'] if columns is None else columns
+
+    right = higher_df[['time'] + list(columns)].copy()
+    right['time'] = right['time'] + pd.Timedelta(minutes=get_minutes(granularity))
+    right = right.rename(columns={c: f"{c}{suffix}" for c in columns})
+
+    # a row is known at its own close
+    step = df['time'].diff().min() if len(df) > 1 else pd.Timedelta(0)
+    left = df.assign(_close=df['time'] + step)
+    merged = pd.merge_asof(left.sort_values('_close'), right.rename(columns={'time': '_close'}), on='_close')
+    return merged.drop(columns=['_close']).set_axis(df.index)
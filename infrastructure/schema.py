@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+PRICE_PREFIXES = ['mid', 'bid', 'ask']
+PRICE_COLUMNS = [f"{p}_{o}" for p in PRICE_PREFIXES for o in ['o', 'h', 'l', 'c']]
+PRICE_DTYPES = ['float64', 'float32']
+# price valued technicals and state machine results
+PRICE_RESULT_COLUMNS = ['ma_10', 'ma_50', 'ma_100', 'ma_150', 'entry_price', 'stop_loss', 'take_profit', 'bottom_low', 'pips']
+STIME_FORMAT = "s%y-%m-%d %H:%M"
+# what the charts read from a saved analyzed frame; bid/ask stay in the candle store and the trade values in the ledger
+FRAME_COLUMNS = [
+    'time', 'mid_o', 'mid_h', 'mid_l', 'mid_c', 'ma_10', 'ma_50', 'ma_100', 'ma_150',
+    'in_downtrend', 'is_bottom', 'strong_bullish', 'trade', 'stage'
+]
+
+def compact_candles(df: pd.DataFrame, price_dtype='float32'):
+    """
+    Casts the price columns present to price_dtype and volume to int32, in place.
+    float32 keeps about 7 significant digits, enough for 5 decimal fx quotes.
+    """
+    if price_dtype not in PRICE_DTYPES:
+        raise ValueError(f"price_dtype must be one of {PRICE_DTYPES}")
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(price_dtype)
+    if 'volume' in df.columns:
+        df['volume'] = df['volume'].astype(np.int32)
+    return df
+
+def compact_results(df: pd.DataFrame, price_dtype='float32'):
+    # same as compact_candles for the columns analyze_pair adds, NaN stays the empty marker
+    if price_dtype not in PRICE_DTYPES:
+        raise ValueError(f"price_dtype must be one of {PRICE_DTYPES}")
+    for col in PRICE_RESULT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(price_dtype)
+    return df
+
+def slim_frame(df: pd.DataFrame, price_dtype=None):
+    """
+    Copy of an analyzed frame cut down to FRAME_COLUMNS, for saving. Prices keep their dtype
+    unless price_dtype is given.
+    """
+    slim = df[[col for col in FRAME_COLUMNS if col in df.columns]].copy()
+    if price_dtype is None:
+        return slim
+    compact_candles(slim, price_dtype)
+    return compact_results(slim, price_dtype)
+
+def add_stime(df: pd.DataFrame):
+    # chart label column, only built for frames that are drawn
+    if 'sTime' not in df.columns:
+        df['sTime'] = df['time'].dt.strftime(STIME_FORMAT)
+    return df
+
+def to_category(codes, labels):
+    """
+    int8 code array -> Categorical where code 0 (labels[0] is None) is missing.
+    """
+    return pd.Categorical.from_codes(codes.astype(np.int8) - 1, categories=labels[1:])
+
+def memory_mb(df: pd.DataFrame):
+    return round(df.memory_usage(deep=True).sum() / 1024**2, 2)
@@ -0,0 +1,176 @@
+import zlib
+import numpy as np
+import pandas as pd
+from api.oanda_api import OandaApi, PRICE_CODES
+from infrastructure import candle_store
+from infrastructure.data_collection import INCREMENTS, CANDLE_COUNT, is_market_closed
+
+# annualized drift / volatility, spread multiplier and mean length in candles of each regime
+DEFAULT_REGIMES = [
+    dict(drift=0.0, vol=0.06, spread=1.0, mean_length=5000),
+    dict(drift=-0.15, vol=0.12, spread=1.6, mean_length=2000),
+    dict(drift=0.12, vol=0.09, spread=1.2, mean_length=3000)
+]
+MINUTES_PER_YEAR = 365 * 24 * 60
+
+def get_seed(pair, granularity, seed=0):
+    # stable across runs and processes, unlike hash()
+    return zlib.crc32(f"{pair}_{granularity}_{seed}".encode())
+
+def get_times(rows, granularity, start, skip_closed=True):
+    """
+    rows candle open times from start, skipping weekends and holidays unless skip_closed is False.
+    """
+    freq = pd.Timedelta(minutes=INCREMENTS[granularity] // CANDLE_COUNT)
+    start = candle_store.to_utc(start)
+    if not skip_closed:
+        return pd.date_range(start, periods=rows, freq=freq, unit='ns')
+
+    # roughly 70% of the week is open, grow the grid until it holds enough open candles
+    grid_rows = int(rows * 1.5) + 1000
+    while True:
+        times = pd.date_range(start, periods=grid_rows, freq=freq, unit='ns')
+        # the closes are whole hours, so they are evaluated once per hour and looked up per candle
+        first_hour = start.floor('h')
+        hours = pd.date_range(first_hour, times[-1], freq='h', unit='ns')
+        hour_index = (times.asi8 - first_hour.value) // pd.Timedelta(hours=1).value
+        times = times[~np.asarray(is_market_closed(hours))[hour_index]]
+        if len(times) >= rows:
+            return times[:rows]
+        grid_rows *= 2
+
+def get_regimes(rows, rng, regimes):
+    """
+    Regime index per candle from a Markov chain that switches to one of the other regimes after
+    a geometric number of candles, drawn as whole runs rather than candle by candle.
+    """
+    n = len(regimes)
+    mean_length = np.array([r['mean_length'] for r in regimes], dtype=np.float64)
+    labels = []
+    lengths = []
+    total = 0
+    current = int(rng.integers(n))
+    while total < rows:
+        # a batch of runs at a time, enough on average to cover what is left
+        batch = max(16, int((rows - total) / mean_length.min()) + 1)
+        steps = rng.integers(1, n, batch) if n > 1 else np.zeros(batch, dtype=np.int64)
+        run_labels = (current + np.cumsum(steps)) % n
+        run_labels = np.r_[current, run_labels[:-1]]
+        run_lengths = rng.geometric(1.0 / mean_length[run_labels])
+        labels.append(run_labels)
+        lengths.append(run_lengths)
+        total += int(run_lengths.sum())
+        current = int((run_labels[-1] + steps[-1]) % n) if n > 1 else 0
+    return np.repeat(np.concatenate(labels), np.concatenate(lengths))[:rows]
+
+def generate_candles(rows, granularity='M5', pair='EUR_USD', start='2015-01-05T00:00:00Z', seed=0,
+                     start_price=None, spread_pips=1.2, regimes=None, components=None, skip_closed=True):
+    """
+    Deterministic synthetic candles in the get_candles_df schema.
+
+    Closes follow a geometric brownian motion whose drift, volatility and spread switch between
+    regimes; highs and lows extend past the open/close by an exponential share of the candle's
+    volatility; bid/ask sit half a spread either side of mid and are rounded to the pair's
+    precision; volume rises with the size of the move and during the London / New York hours.
+    Everything is drawn with numpy in whole-array passes, so tens of millions of rows take seconds.
+    The same (rows, granularity, pair, start, seed) always gives the same frame.
+    """
+    regimes = DEFAULT_REGIMES if regimes is None else regimes
+    components = ['mid', 'bid', 'ask'] if components is None else components
+    rng = np.random.default_rng(get_seed(pair, granularity, seed))
+    pip_divisor = 100 if 'JPY' in pair else 10000
+    decimals = 3 if 'JPY' in pair else 5
+    start_price = (110.0 if 'JPY' in pair else 1.1) if start_price is None else start_price
+
+    times = get_times(rows, granularity, start, skip_closed)
+    dt_years = (INCREMENTS[granularity] // CANDLE_COUNT) / MINUTES_PER_YEAR
+    regime = get_regimes(rows, rng, regimes)
+    drift = np.array([r['drift'] for r in regimes])[regime]
+    vol = np.array([r['vol'] for r in regimes])[regime] * np.sqrt(dt_years)
+    spread_scale = np.array([r['spread'] for r in regimes])[regime]
+
+    shocks = rng.standard_normal(rows)
+    log_returns = (drift * dt_years - 0.5 * vol**2) + vol * shocks
+    close = start_price * np.exp(np.cumsum(log_returns))
+    open_ = np.r_[start_price, close[:-1]]
+    high = np.maximum(open_, close) * np.exp(vol * rng.exponential(0.5, rows))
+    low = np.minimum(open_, close) * np.exp(-vol * rng.exponential(0.5, rows))
+
+    hour = (times.asi8 // pd.Timedelta(hours=1).value) % 24
+    session = np.where((hour >= 7) & (hour < 17), 1.8, 1.0)
+    volume = rng.poisson(200 * session * (1 + np.abs(shocks)))
+    spread = spread_pips / pip_divisor * spread_scale * rng.lognormal(0.0, 0.25, rows) / session
+
+    data = {
+        'time': times,
+        'volume': volume.astype(np.int64)
+    }
+    prices = {'mid': {}, 'bid': {}, 'ask': {}}
+    for o, values in dict(o=open_, h=high, l=low, c=close).items():
+        prices['bid'][o] = np.round(values - spread / 2, decimals)
+        prices['ask'][o] = np.round(values + spread / 2, decimals)
+        # oanda's mid is the bid/ask average, so it carries one more decimal
+        prices['mid'][o] = np.round((prices['bid'][o] + prices['ask'][o]) / 2, decimals + 1)
+
+    for p in ['mid', 'bid', 'ask']:
+        if p in components:
+            for o in ['o', 'h', 'l', 'c']:
+                data[f"{p}_{o}"] = prices[p][o]
+    return pd.DataFrame(data)
+
+def to_candles_json(df: pd.DataFrame):
+    """
+    Oanda style candle dicts for df, the inverse of OandaApi.candles_to_df.
+    """
+    candles = []
+    prices = [p for p in ['mid', 'bid', 'ask'] if f"{p}_o" in df.columns]
+    times = df['time'].dt.strftime('%Y-%m-%dT%H:%M:%S.000000000Z').to_numpy()
+    values = {f"{p}_{o}": df[f"{p}_{o}"].to_numpy().astype(str) for p in prices for o in 'ohlc'}
+    volume = df['volume'].to_numpy()
+    for i in range(len(df)):
+        candle = dict(complete=True, volume=int(volume[i]), time=times[i])
+        for p in prices:
+            candle[p] = {o: values[f"{p}_{o}"][i] for o in 'ohlc'}
+        candles.append(candle)
+    return candles
+
+def write_fixture(pairs, granularities, rows, path=candle_store.STORE_PATH, seed=0, **kwargs):
+    """
+    Fills a candle store with synthetic data so load_pair and the backtests run offline.
+    """
+    for pair in pairs:
+        for granularity in granularities:
+            df = generate_candles(rows, granularity, pair, seed=seed, **kwargs)
+            candle_store.write_candles(df, pair, granularity, path)
+            print(f"{pair} {granularity} --> {rows} synthetic candles written")
+
+class SyntheticApi(OandaApi):
+    """
+    Stands in for OandaApi without a network: candle requests are served from a synthetic
+    series per (pair, granularity), so data collection, the downloader and the live runner
+    can be exercised offline. Parsing goes through the real candles_to_df.
+    """
+    def __init__(self, rows=200_000, start='2015-01-05T00:00:00Z', seed=0):
+        self.rows = rows
+        self.start = start
+        self.seed = seed
+        self.series = {}
+
+    def get_series(self, pair, granularity):
+        key = (pair, granularity)
+        if key not in self.series:
+            self.series[key] = generate_candles(self.rows, granularity, pair, self.start, self.seed)
+        return self.series[key]
+
+    def fetch_candles(self, pair_name, count=10, granularity='H4', price='MBA', from_date=None, to_date=None):
+        df = self.get_series(pair_name, granularity)
+        if from_date is not None and to_date is not None:
+            times = df['time']
+            df = df[(times >= candle_store.to_utc(from_date)) & (times < candle_store.to_utc(to_date))]
+        else:
+            df = df.iloc[-count:]
+
+        codes = {code: p for p, code in PRICE_CODES.items()}
+        prices = [codes[c] for c in price]
+        columns = ['time', 'volume'] + [f"{p}_{o}" for p in prices for o in 'ohlc']
+        return to_candles_json(df[columns])
@@ -0,0 +1,86 @@
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+CACHE_PATH = "./data/technicals_cache"
+MAX_CACHE_BYTES = 2 * 1024**3
+
+def hash_candles(df: pd.DataFrame, columns=('time', 'mid_o', 'mid_h', 'mid_l', 'mid_c')):
+    # hashes the raw column bytes, so the same candles hash the same whatever file or date range they came from
+    h = hashlib.blake2b(digest_size=16)
+    for col in columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.to_numpy(dtype='datetime64[ns]')
+        else:
+            values = values.to_numpy()
+        h.update(col.encode())
+        h.update(np.ascontiguousarray(values).tobytes())
+    h.update(np.ascontiguousarray(df.index.to_numpy()).tobytes())
+    return h.hexdigest()
+
+def get_key(df: pd.DataFrame, params: dict):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(hash_candles(df).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+def get_file(key, path=CACHE_PATH):
+    return f"{path}/{key}.parquet"
+
+def load(key, path=CACHE_PATH):
+    """
+    Returns the cached frame for key or None. A hit bumps the file's mtime, which is what
+    eviction orders by.
+    """
+    file_name = get_file(key, path)
+    if not os.path.exists(file_name):
+        return None
+    try:
+        df = pd.read_parquet(file_name)
+    except (OSError, ValueError):
+        # evicted or half written by another process
+        return None
+    try:
+        os.utime(file_name)
+    except FileNotFoundError:
+        # evicted by another process between the read and the touch
+        return None
+    return df
+
+def save(key, df: pd.DataFrame, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+    os.makedirs(path, exist_ok=True)
+    file_name = get_file(key, path)
+    temp_name = f"{file_name}.{os.getpid()}.tmp"
+    df.to_parquet(temp_name)
+    os.replace(temp_name, file_name)
+    evict(path, max_bytes)
+
+def evict(path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+    """
+    Deletes least recently used entries until the cache fits in max_bytes.
+    """
+    entries = []
+    for file_name in glob.glob(f"{path}/*.parquet"):
+        try:
+            stat = os.stat(file_name)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, file_name))
+
+    total = sum(e[1] for e in entries)
+    for _, size, file_name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(file_name)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def clear(path=CACHE_PATH):
+    for file_name in glob.glob(f"{path}/*.parquet"):
+        os.remove(file_name)
@@ -1,12 +1,24 @@
 from api.oanda_api import OandaApi
 from infrastructure.instrument_collection import InstrumentCollection
 from infrastructure import data_collection
+from infrastructure import candle_store
+from infrastructure import candle_arrays
+from infrastructure import downloader
+from infrastructure import live_trading
 from backtesting import backtesting
+from backtesting import portfolio
+from backtesting import walk_forward
+import argparse
+import asyncio
 import datetime
 
 
 
 if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--workers', type=int, default=None, help='max backtest worker processes (default: all cores)')
+    args = arg_parser.parse_args()
+
     start = datetime.datetime.now()
     print(f"🚀 Start Time: {start.strftime('%Y-%m-%d %H:%M:%S')}")
     
@@ -18,8 +30,15 @@ if __name__ == '__main__':
     # granularities = ['M5']
 
     instument_collection.load_instruments('./data')
+    # candle_store.convert_pickles('./data')
+    # candle_arrays.convert_store()
     # data_collection.run_collection(instument_collection, api, granularities)
-    backtesting.run_wirly_dirly_test(pairs, granularities, instument_collection)
+    # data_collection.run_collection(instument_collection, api, granularities, incremental=True)
+    # downloader.run_collection(instument_collection, granularities, workers=8)
+    # asyncio.run(live_trading.LiveRunner(api, pairs, 'M5', live_trading.SimulatedBroker()).run())
+    # walk_forward.run_walk_forward(pairs, ['H1'], {'sl_pips': [0, 5, 10], 'tp_to_sl_ratio': [0.5, 1, 2]}, workers=args.workers)
+    # portfolio.run_portfolio(pairs, 'M5', ic=instument_collection, workers=args.workers)
+    backtesting.run_wirly_dirly_test(pairs, granularities, instument_collection, workers=args.workers)
 
     end = datetime.datetime.now()
     duration = end - start
@@ -1,30 +1,87 @@
+import numpy as np
+import pandas as pd
 
+STRONG_BULLISH_FEATURES = [
+    'body', 'total_range', 'upper_wick', 'lower_wick', 'wick_ratio',
+    'avg_range', 'range_ok', 'wick_ok', 'close_near_high', 'strong_bullish'
+]
 
-def detect_strong_bullish(df, lookback=20, range_multiplier=1.5, wick_ratio_thresh=0.7, close_proximity_thresh=0.2):
+def strong_bullish_features(o, h, l, c, lookback=20, range_multiplier=1.5, wick_ratio_thresh=0.7,
+                            close_proximity_thresh=0.2, features=('strong_bullish',)):
+    """
+    Computes the strong bullish candle features on raw numpy arrays.
+    Only the features asked for are returned; intermediates reuse one scratch buffer.
+
+    Returns dict of feature name -> numpy array.
+    """
+    features = set(features)
+    n = len(o)
+    out = {}
+
+    total_range = np.subtract(h, l)
+    # avoid divide-by-zero
+    safe_range = np.where(total_range == 0, 1e-9, total_range)
+    # pandas' rolling mean, so range_ok matches the original column exactly
+    avg_range = pd.Series(total_range, copy=False).rolling(window=lookback).mean().to_numpy()
+
+    scratch = np.empty(n)
+    range_ok = np.greater(total_range, np.multiply(avg_range, range_multiplier, out=scratch))
+
+    body = np.subtract(c, o)
+    wick_ratio = np.divide(body, safe_range)
+    wick_ok = wick_ratio > wick_ratio_thresh
+
+    np.subtract(h, c, out=scratch)
+    close_near_high = np.divide(scratch, safe_range, out=scratch) < close_proximity_thresh
+
+    if 'strong_bullish' in features:
+        out['strong_bullish'] = range_ok & wick_ok & close_near_high
+    if 'body' in features:
+        out['body'] = body
+    if 'total_range' in features:
+        out['total_range'] = total_range
+    if 'upper_wick' in features:
+        out['upper_wick'] = h - np.maximum(c, o)
+    if 'lower_wick' in features:
+        out['lower_wick'] = np.minimum(c, o) - l
+    if 'wick_ratio' in features:
+        out['wick_ratio'] = wick_ratio
+    if 'avg_range' in features:
+        out['avg_range'] = avg_range
+    if 'range_ok' in features:
+        out['range_ok'] = range_ok
+    if 'wick_ok' in features:
+        out['wick_ok'] = wick_ok
+    if 'close_near_high' in features:
+        out['close_near_high'] = close_near_high
+    return out
+
+def detect_strong_bullish(df, lookback=20, range_multiplier=1.5, wick_ratio_thresh=0.7, close_proximity_thresh=0.2,
+                          columns=('strong_bullish',), debug=False):
     """
     Detects strong bullish candles using:
     1. Full candle range > avg of previous candle ranges * multiplier
     2. Wick-to-body ratio indicates a decisive candle
     3. Close is near the high (momentum)
 
-    Adds a 'strong_bullish' column to df with boolean values.
+    Adds a 'strong_bullish' column to df with boolean values. Pass columns to choose which
+    features are written, or debug=True to write every intermediate column for charting.
     """
-
-    # Calculate candle components
-    df['body'] = df['mid_c'] - df['mid_o']
-    df['total_range'] = df['mid_h'] - df['mid_l']
-    df['upper_wick'] = df['mid_h'] - df[['mid_c', 'mid_o']].max(axis=1)
-    df['lower_wick'] = df[['mid_c', 'mid_o']].min(axis=1) - df['mid_l']
-
-    # Avoid divide-by-zero
-    df['wick_ratio'] = df['body'] / df['total_range'].replace(0, 1e-9)
-    df['avg_range'] = df['total_range'].rolling(window=lookback).mean()
-    df['range_ok'] = df['total_range'] > df['avg_range'] * range_multiplier
-    df['wick_ok'] = df['wick_ratio'] > wick_ratio_thresh
-    df['close_near_high'] = (df['mid_h'] - df['mid_c']) / df['total_range'].replace(0, 1e-9) < close_proximity_thresh
-
-    # All conditions must be met
-    df['strong_bullish'] = df['range_ok'] & df['wick_ok'] & df['close_near_high']
+    features = STRONG_BULLISH_FEATURES if debug else columns
+    result = strong_bullish_features(
+        df['mid_o'].to_numpy(dtype=np.float64),
+        df['mid_h'].to_numpy(dtype=np.float64),
+        df['mid_l'].to_numpy(dtype=np.float64),
+        df['mid_c'].to_numpy(dtype=np.float64),
+        lookback=lookback,
+        range_multiplier=range_multiplier,
+        wick_ratio_thresh=wick_ratio_thresh,
+        close_proximity_thresh=close_proximity_thresh,
+        features=features
+    )
+    for name in STRONG_BULLISH_FEATURES:
+        if name in result:
+            df[name] = result[name]
 
     # Set 'setup_stage' to 'confirmation' if previous candle was 'reentry' and current is strong bullish
     # for i in range(1, len(df)):
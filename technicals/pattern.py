@@ -136,4 +136,118 @@ def detect_bottom_reversal_setups(
         'reentry' in df.loc[zone_index:index, 'setup_stage'].values
         and row[strength_col] > strength_threshold
     ):
-        df.at[index, 'setup_stage'] = 'confirmation'
\ No newline at end of file
+        df.at[index, 'setup_stage'] = 'confirmation'
+
+
+def apply_bullish_strength(df, lookback=200):
+    """
+    Whole-series version of bullish_strength_with_context: scores every row in one pass
+    using a rolling mean of the previous `lookback` candle ranges instead of per-row lookups.
+    """
+    o = df['mid_o'].to_numpy(dtype=np.float64)
+    h = df['mid_h'].to_numpy(dtype=np.float64)
+    l = df['mid_l'].to_numpy(dtype=np.float64)
+    c = df['mid_c'].to_numpy(dtype=np.float64)
+
+    body = c - o
+    total_range = h - l
+    # mean of the ranges of rows [i - lookback, i), fewer at the start of the series
+    candle_avg = pd.Series(total_range).rolling(window=lookback, min_periods=1).mean().shift(1).to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        partial = np.round((body / candle_avg) * 0.9, 3)
+    score = np.where(body >= candle_avg, 1.0, partial)
+
+    scored = (c > o) & (body >= total_range * 0.7) & ~np.isnan(candle_avg)
+    df['bullish_strength_score'] = np.where(scored, score, 0.0)
+
+def apply_bottom_reversal_setups(
+    df,
+    pair,
+    strength_col='bullish_strength_score',
+    strength_threshold=0.7,
+    rolling_window=40,
+    breakout_threshold=20  # in pips
+):
+    """
+    Whole-series version of detect_bottom_reversal_setups, same result as calling it for
+    every row in order. Instead of re-scanning df.loc[:index] per row it carries forward the
+    last bottom index and counts of 'breakout' / 'reentry' stages seen since that bottom.
+    """
+    for col in ['setup_stage', 'is_bottom', 'active_zone_low', 'active_zone_high']:
+        if col not in df.columns:
+            df[col] = None
+
+    low = df['mid_l'].to_numpy(dtype=np.float64)
+    high = df['mid_h'].to_numpy(dtype=np.float64)
+    in_downtrend = df['in_downtrend'].to_numpy()
+    strength = df[strength_col].to_numpy()
+    window_low = df['mid_l'].rolling(window=rolling_window + 1, min_periods=1).min().to_numpy()
+
+    stage = df['setup_stage'].to_numpy(dtype=object).copy()
+    is_bottom = df['is_bottom'].to_numpy().copy()
+    zone_lows = df['active_zone_low'].to_numpy().copy()
+    zone_highs = df['active_zone_high'].to_numpy().copy()
+
+    breakout_offset = breakout_threshold / (100 if 'JPY' in pair else 10000)
+    zone_index = None
+    breakouts = 0
+    reentries = 0
+
+    for i in range(len(df)):
+        # Step 1: Bottom detection
+        if low[i] == window_low[i] and in_downtrend[i]:
+            stage[i] = 'bottom'
+            is_bottom[i] = True
+            zone_lows[i] = low[i]
+            zone_highs[i] = high[i]
+            zone_index = i
+            breakouts = 0
+            reentries = 0
+            continue
+
+        # the window searched for stages runs from the last bottom through this row
+        if stage[i] == 'bottom':
+            zone_index = i
+            breakouts = 0
+            reentries = 0
+        elif stage[i] == 'breakout':
+            breakouts += 1
+        elif stage[i] == 'reentry':
+            reentries += 1
+
+        if zone_index is None:
+            continue
+
+        zone_low = low[zone_index]
+        zone_high = high[zone_index]
+        zone_lows[i] = zone_low
+        zone_highs[i] = zone_high
+
+        if low[i] > zone_high + breakout_offset:
+            continue
+
+        new_stage = None
+        if breakouts == 0 and low[i] > zone_high:
+            new_stage = 'breakout'
+        elif breakouts > 0 and reentries == 0 and zone_low <= low[i] <= zone_high:
+            new_stage = 'reentry'
+        elif reentries > 0 and strength[i] > strength_threshold:
+            new_stage = 'confirmation'
+
+        if new_stage is not None:
+            # the row's previous stage drops out of the window
+            if stage[i] == 'breakout':
+                breakouts -= 1
+            elif stage[i] == 'reentry':
+                reentries -= 1
+            stage[i] = new_stage
+            if new_stage == 'breakout':
+                breakouts += 1
+            elif new_stage == 'reentry':
+                reentries += 1
+
+    df['setup_stage'] = stage
+    df['is_bottom'] = is_bottom
+    df['active_zone_low'] = zone_lows
+    df['active_zone_high'] = zone_highs
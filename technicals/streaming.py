@@ -0,0 +1,194 @@
+from collections import deque
+import math
+
+class RollingMean:
+    """
+    O(1) rolling mean over a fixed ring buffer, computed step for step like pandas'
+    rolling(window).mean() (roll_mean in pandas/_libs/window/aggregations.pyx): a Kahan
+    summed total with separate compensations for added and removed values, the outgoing value
+    removed before the new one is added, and a run of identical values returning that value.
+    That keeps the moving averages, and the comparisons made on them, equal to the batch path.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.buffer = [math.nan] * window
+        self.pos = 0
+        self.count = 0
+        self._reset()
+
+    def _reset(self):
+        self.nobs = 0
+        self.neg_ct = 0
+        self.total = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = math.nan
+
+    def _add(self, value):
+        if math.isnan(value):
+            return
+        self.nobs += 1
+        y = value - self.compensation_add
+        t = self.total + y
+        self.compensation_add = t - self.total - y
+        self.total = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        self.same_count = self.same_count + 1 if value == self.prev_value else 1
+        self.prev_value = value
+
+    def _remove(self, value):
+        if math.isnan(value):
+            return
+        self.nobs -= 1
+        y = -value - self.compensation_remove
+        t = self.total + y
+        self.compensation_remove = t - self.total - y
+        self.total = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+    def update(self, value):
+        if self.window == 1:
+            # pandas starts every one-value window from scratch
+            self._reset()
+        elif self.count == self.window:
+            self._remove(self.buffer[self.pos])
+        if self.count < self.window:
+            self.count += 1
+        self.buffer[self.pos] = value
+        self.pos = (self.pos + 1) % self.window
+        self._add(value)
+        return self.value
+
+    @property
+    def ready(self):
+        return self.count == self.window
+
+    @property
+    def value(self):
+        if self.nobs < self.window:
+            return math.nan
+        if self.same_count >= self.nobs:
+            return self.prev_value
+        result = self.total / self.nobs
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+class RollingMin:
+    """
+    Rolling minimum using a monotonic deque of (index, value), amortized O(1) per update.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.index = -1
+        self.values = deque()
+
+    def update(self, value):
+        self.index += 1
+        while self.values and self.values[-1][1] >= value:
+            self.values.pop()
+        self.values.append((self.index, value))
+        if self.values[0][0] <= self.index - self.window:
+            self.values.popleft()
+        return self.value
+
+    @property
+    def ready(self):
+        return self.index + 1 >= self.window
+
+    @property
+    def value(self):
+        return self.values[0][1] if self.ready else math.nan
+
+class DowntrendDetector:
+    """
+    Streaming version of trend.apply_downtrend: 10 < 50 < 100 < 150 moving averages of mid_c.
+    """
+    def __init__(self, windows=(10, 50, 100, 150)):
+        self.mas = {w: RollingMean(w) for w in windows}
+        self.windows = sorted(windows)
+
+    def update(self, close):
+        for ma in self.mas.values():
+            ma.update(close)
+        return self.in_downtrend
+
+    @property
+    def ready(self):
+        return all(ma.ready for ma in self.mas.values())
+
+    @property
+    def in_downtrend(self):
+        if not self.ready:
+            return False
+        values = [self.mas[w].value for w in self.windows]
+        return all(values[i] < values[i + 1] for i in range(len(values) - 1))
+
+class BottomDetector:
+    """
+    Streaming version of bottom.apply_bottom_zones: the low equals the rolling minimum low.
+    """
+    def __init__(self, rolling_window=60):
+        self.rolling_min = RollingMin(rolling_window)
+
+    def update(self, low):
+        rolling_low = self.rolling_min.update(low)
+        return self.rolling_min.ready and low == rolling_low
+
+class StrongBullishDetector:
+    """
+    Streaming version of candle.detect_strong_bullish.
+    """
+    def __init__(self, lookback=20, range_multiplier=1.5, wick_ratio_thresh=0.7, close_proximity_thresh=0.2):
+        self.avg_range = RollingMean(lookback)
+        self.range_multiplier = range_multiplier
+        self.wick_ratio_thresh = wick_ratio_thresh
+        self.close_proximity_thresh = close_proximity_thresh
+
+    def update(self, o, h, l, c):
+        total_range = h - l
+        avg_range = self.avg_range.update(total_range)
+        safe_range = total_range if total_range != 0 else 1e-9
+
+        range_ok = self.avg_range.ready and total_range > avg_range * self.range_multiplier
+        wick_ok = (c - o) / safe_range > self.wick_ratio_thresh
+        close_near_high = (h - c) / safe_range < self.close_proximity_thresh
+        return range_ok and wick_ok and close_near_high
+
+class TechnicalsEngine:
+    """
+    Feeds one candle at a time through the downtrend, bottom and strong bullish detectors.
+
+    Mirrors backtesting.apply_technicals: apply_downtrend drops rows until every moving average
+    is populated, so the bottom and strong bullish windows only start counting after that.
+    update() returns None for those warm-up candles, otherwise a dict of the technicals columns.
+    """
+    def __init__(self, bottom_zone_lookback=60, confirmation_wick_ratio=0.7):
+        self.downtrend = DowntrendDetector()
+        self.bottom = BottomDetector(bottom_zone_lookback)
+        self.strong_bullish = StrongBullishDetector(wick_ratio_thresh=confirmation_wick_ratio)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['bottom_zone_lookback'], config['confirmation_wick_ratio'])
+
+    def update(self, candle):
+        in_downtrend = self.downtrend.update(candle['mid_c'])
+        if not self.downtrend.ready:
+            return None
+
+        return {
+            'in_downtrend': in_downtrend,
+            'is_bottom': self.bottom.update(candle['mid_l']),
+            'strong_bullish': self.strong_bullish.update(candle['mid_o'], candle['mid_h'], candle['mid_l'], candle['mid_c'])
+        }
+
+    def warm_up(self, df):
+        # replays history so the engine is ready for the next live candle
+        for candle in df[['mid_o', 'mid_h', 'mid_l', 'mid_c']].to_dict('records'):
+            self.update(candle)
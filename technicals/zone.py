@@ -1,3 +1,4 @@
+import bisect
 import pandas as pd
 import numpy as np
 from scipy.signal import argrelextrema
@@ -200,6 +201,214 @@ def attach_zones_to_confirmations(
             df.at[index, 'meets_ratio'] = ratio >= 1.0
 
 
+class ClusteredLevels:
+    """
+    Sorted raw levels plus the clustering find_support_resistance would produce for them.
+
+    Clustering is greedy over the sorted levels (a level joins the current cluster while it is within
+    clustering_threshold of the cluster mean), so a new level can only change the clusters from the
+    one it lands in upwards. Clusters below that are cached and only the rest is re-clustered, with
+    numpy prefix means instead of a python loop per level.
+    """
+    def __init__(self, clustering_threshold=0.0050):
+        self.clustering_threshold = clustering_threshold
+        self.values = []
+        self.starts = []
+        self.levels = []
+        self.dirty = None
+
+    def add(self, value):
+        pos = bisect.bisect_right(self.values, value)
+        self.values.insert(pos, value)
+        self.dirty = pos if self.dirty is None else min(self.dirty, pos)
+
+    def _first_affected(self, pos):
+        # the cluster a value inserted at pos could join, or the first one
+        return max(bisect.bisect_left(self.starts, pos) - 1, 0)
+
+    def _cluster(self, values):
+        """
+        Greedy clustering of a sorted array, returns (starts, levels) with levels None for
+        clusters of a single level.
+        """
+        threshold = self.clustering_threshold
+        starts = []
+        levels = []
+        s = 0
+        n = len(values)
+        while s < n:
+            e = n
+            w = 64
+            while True:
+                seg = values[s:s + w]
+                means = np.cumsum(seg)[:-1] / np.arange(1, len(seg))
+                distance = np.abs(seg[1:] - means)
+                # levels right at the threshold are re-checked with np.mean like cluster_levels does
+                check = np.flatnonzero((distance > threshold) | (np.abs(distance - threshold) < 1e-12))
+                found = False
+                for q in check:
+                    if abs(seg[q + 1] - np.mean(seg[:q + 1])) > threshold:
+                        e = s + q + 1
+                        found = True
+                        break
+                if found or s + w >= n:
+                    break
+                w *= 2
+            starts.append(s)
+            levels.append(round(np.mean(values[s:e]), 5) if e - s >= 2 else None)
+            s = e
+        return starts, levels
+
+    def _refresh(self):
+        if self.dirty is None:
+            return
+        c = self._first_affected(self.dirty) if len(self.starts) > 0 else 0
+        start = self.starts[c] if len(self.starts) > 0 else 0
+        starts, levels = self._cluster(np.array(self.values[start:]))
+        self.starts = self.starts[:c] + [start + s for s in starts]
+        self.levels = self.levels[:c] + levels
+        self.dirty = None
+
+    def get_levels(self, extra=()):
+        """
+        Sorted clustered levels (clusters of 2 or more raw levels), optionally as if the
+        `extra` raw levels were also in the index.
+        """
+        self._refresh()
+        if len(extra) == 0 or len(self.values) == 0:
+            if len(extra) > 0:
+                return [l for l in self._cluster(np.sort(np.array(extra)))[1] if l is not None]
+            return [l for l in self.levels if l is not None]
+
+        pos = min(bisect.bisect_right(self.values, v) for v in extra)
+        c = self._first_affected(pos)
+        start = self.starts[c]
+        tail = np.sort(np.concatenate([np.array(self.values[start:]), np.array(extra)]))
+        _, tail_levels = self._cluster(tail)
+        return [l for l in self.levels[:c] + tail_levels if l is not None]
+
+class LevelIndex:
+    """
+    Incremental version of find_support_resistance for a series that only grows.
+
+    Local extrema are final once `window` newer rows exist and are added to sorted, clustered
+    support/resistance levels as the index advances; the last `window` rows are only provisional
+    extrema and are evaluated at query time, exactly as argrelextrema would on df.iloc[:end].
+    """
+    def __init__(self, lows, highs, window=3, clustering_threshold=0.0050):
+        self.lows = np.asarray(lows, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.window = window
+        self.supports = ClusteredLevels(clustering_threshold)
+        self.resistances = ClusteredLevels(clustering_threshold)
+        self.end = 0
+        self.final_end = 0
+
+    def _extrema(self, values, comparator, start, stop, end):
+        # argrelextrema(values[:end], comparator, order=window, mode='clip') restricted to [start, stop)
+        idx = np.arange(start, stop)
+        result = np.ones(len(idx), dtype=bool)
+        for shift in range(1, self.window + 1):
+            result &= comparator(values[idx], values[np.minimum(idx + shift, end - 1)])
+            result &= comparator(values[idx], values[np.maximum(idx - shift, 0)])
+        return idx[result]
+
+    def advance(self, end):
+        """
+        Moves the index forward so it describes rows [0, end).
+        """
+        self.end = end
+        final_end = max(end - self.window, 0)
+        if final_end > self.final_end:
+            for i in self._extrema(self.lows, np.less_equal, self.final_end, final_end, end):
+                self.supports.add(self.lows[i])
+            for i in self._extrema(self.highs, np.greater_equal, self.final_end, final_end, end):
+                self.resistances.add(self.highs[i])
+            self.final_end = final_end
+
+    def get_levels(self):
+        """
+        Returns (support_levels, resistance_levels) for rows [0, end), same as find_support_resistance.
+        """
+        lows = [self.lows[i] for i in self._extrema(self.lows, np.less_equal, self.final_end, self.end, self.end)]
+        highs = [self.highs[i] for i in self._extrema(self.highs, np.greater_equal, self.final_end, self.end, self.end)]
+        return self.supports.get_levels(lows), self.resistances.get_levels(highs)
+
+    def get_zones(self, price, num_of_zones=3, min_gap=0.0, min_width=0.0015):
+        """
+        Same zones as get_zones_for_price on get_levels(), found with bisect.
+        """
+        support_levels, resistance_levels = self.get_levels()
+        return find_zones_sorted(price, support_levels, resistance_levels, num_of_zones, min_gap, min_width)
+
+def find_zones_sorted(price, support_levels, resistance_levels, num_of_zones=3, min_gap=0.0, min_width=0.0015):
+    """
+    get_zones_for_price for already sorted level lists, using bisect instead of linear scans.
+    """
+    zones = []
+    last_resistance = price
+    i = bisect.bisect_right(support_levels, price)
+
+    while i < len(support_levels) and len(zones) < num_of_zones:
+        support = support_levels[i]
+        if support <= last_resistance + min_gap:
+            i = bisect.bisect_right(support_levels, last_resistance + min_gap, lo=i)
+            continue
+
+        # first resistance above the support that is at least min_width away
+        lo = bisect.bisect_right(resistance_levels, support)
+        j = bisect.bisect_left(resistance_levels, support + min_width, lo=lo)
+        while j > lo and resistance_levels[j - 1] - support >= min_width:
+            j -= 1
+        while j < len(resistance_levels) and resistance_levels[j] - support < min_width:
+            j += 1
+        if j < len(resistance_levels):
+            zones.append((support, resistance_levels[j]))
+            last_resistance = resistance_levels[j]
+        i += 1
+
+    return zones
+
+def apply_confirmation_zones(
+    df,
+    window=3,
+    clustering_threshold=0.0050,
+    num_of_zones=3
+):
+    """
+    Whole-series version of attach_zones_to_confirmations: one LevelIndex is advanced through
+    the confirmation rows in order instead of re-running find_support_resistance on df.iloc[:index].
+    """
+    from copy import deepcopy
+
+    for col in ['confirmation_zones', 'zone_sl_ratio', 'meets_ratio']:
+        if col not in df.columns:
+            df[col] = None if col != 'meets_ratio' else False
+
+    index = LevelIndex(df['mid_l'].to_numpy(), df['mid_h'].to_numpy(), window, clustering_threshold)
+    stages = df['setup_stage'].to_numpy(dtype=object)
+
+    for i in np.flatnonzero(stages == 'confirmation'):
+        if i < window * 2:
+            continue
+
+        index.advance(i)
+        current_price = df.at[i, 'mid_c']
+        current_low = df.at[i, 'mid_l']
+        zones = index.get_zones(current_price, num_of_zones=num_of_zones)
+
+        df.at[i, 'confirmation_zones'] = deepcopy(zones)
+
+        if len(zones) >= 2:
+            zone_top = zones[1][1]
+            reward = zone_top - current_price
+            risk = current_price - current_low
+
+            if risk > 0:
+                ratio = reward / risk
+                df.at[i, 'zone_sl_ratio'] = round(ratio, 3)
+                df.at[i, 'meets_ratio'] = ratio >= 1.0
+
 def plot_candles_with_levels(fig, df, support_levels, resistance_levels,
                               time_col='time', open_col='mid_o', high_col='mid_h',
                               low_col='mid_l', close_col='mid_c'):
@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import constants
+except ImportError:
+    # constants.py holds the oanda credentials and is not committed, the tests never reach the api
+    constants = types.ModuleType('constants')
+    constants.API_KEY = 'test'
+    constants.ACCOUNT_ID = 'test'
+    constants.OANDA_URL = 'http://127.0.0.1:9'
+    sys.modules['constants'] = constants
+
+from infrastructure import synthetic
+
+class MockOanda(ThreadingHTTPServer):
+    """
+    Local stand in for the oanda candles endpoint. Requests answer with the status codes in
+    `failures` first, in order (a 200 among them serves candles), then 200 with synthetic
+    candles. Every request's arrival time and status is recorded.
+    """
+    def __init__(self, failures=None):
+        super().__init__(('127.0.0.1', 0), MockHandler)
+        self.failures = list(failures or [])
+        self.requests = []
+        self.lock = threading.Lock()
+        self.candles = synthetic.SyntheticApi(rows=10000, seed=1)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def next_status(self):
+        with self.lock:
+            status = self.failures.pop(0) if len(self.failures) > 0 else 200
+            self.requests.append((time.monotonic(), status))
+            return status
+
+    def statuses(self):
+        return [status for _, status in self.requests]
+
+class MockHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status = self.server.next_status()
+        if status == 200:
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            pair = url.path.split('/')[-2]
+            body = dict(candles=self.server.candles.fetch_candles(
+                pair, int(params.get('count', 10)), params['granularity'], params['price'], params.get('from'), params.get('to')
+            ))
+        else:
+            body = dict(errorMessage=f"mock {status}")
+
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server(request):
+    mock = MockOanda(getattr(request, 'param', None))
+    thread = threading.Thread(target=mock.serve_forever, daemon=True)
+    thread.start()
+    yield mock
+    mock.shutdown()
+    mock.server_close()
@@ -0,0 +1,18 @@
+from backtesting import backtesting
+
+def test_run_parallel_without_jobs():
+    summary = backtesting.run_parallel([], ['H4'], backtesting.DEFAULT_CONFIG)
+
+    assert summary.empty
+    assert summary.columns.tolist() == ['pair', 'granularity', 'rows', 'trades', 'status', 'seconds']
+
+def test_run_parallel_reports_each_job_in_process(capsys, monkeypatch):
+    def run_job(pair, granularity, *args):
+        return dict(pair=pair, granularity=granularity, rows=1, trades=0, status='ok', seconds=0.0)
+    monkeypatch.setattr(backtesting, 'run_job', run_job)
+
+    summary = backtesting.run_parallel(['EUR_USD', 'USD_JPY'], ['H4'], backtesting.DEFAULT_CONFIG, workers=1)
+
+    out = capsys.readouterr().out
+    assert 'EUR_USD H4 --> ok in 0.0s' in out and 'USD_JPY H4 --> ok in 0.0s' in out
+    assert summary['pair'].tolist() == ['EUR_USD', 'USD_JPY']
@@ -0,0 +1,59 @@
+import datetime as dt
+import pytest
+from api.oanda_api import OandaApi
+from infrastructure import candle_store
+from infrastructure import data_collection
+
+PAIR = 'EUR_USD'
+GRANULARITY = 'H1'
+FROM_DATE = '2015-01-05T00:00:00Z'
+# three INCREMENTS windows
+TO_DATE = '2016-01-15T00:00:00Z'
+WINDOW = dt.timedelta(minutes=data_collection.INCREMENTS[GRANULARITY])
+
+def get_api(server):
+    # the api gives up at once, so the attempts below are data_collection's own
+    return OandaApi(base_url=server.base_url, max_retries=0)
+
+def window_start(n):
+    return candle_store.to_utc(FROM_DATE).to_pydatetime() + n * WINDOW
+
+@pytest.mark.parametrize('server', [[500, 503]], indirect=True)
+def test_fetch_candles_retries_failed_requests(server):
+    df = data_collection.fetch_candles(PAIR, GRANULARITY, window_start(0), window_start(1), get_api(server))
+
+    assert len(df) > 0
+    assert server.statuses() == [500, 503, 200]
+
+@pytest.mark.parametrize('server', [[500, 500, 500]], indirect=True)
+def test_fetch_candles_returns_none_after_every_attempt_failed(server):
+    assert data_collection.fetch_candles(PAIR, GRANULARITY, window_start(0), window_start(1), get_api(server)) is None
+    assert server.statuses() == [500, 500, 500]
+
+def test_empty_window_is_not_a_failure(server):
+    # a weekend, no candles but a successful request
+    saturday = dt.datetime(2015, 1, 10, 2, tzinfo=dt.timezone.utc)
+    df = data_collection.fetch_candles(PAIR, GRANULARITY, saturday, saturday + dt.timedelta(hours=12), get_api(server))
+
+    assert df is not None and df.empty
+    assert server.statuses() == [200]
+
+# the first window succeeds, the second fails on every attempt, the third succeeds
+@pytest.mark.parametrize('server', [[200, 500, 500, 500]], indirect=True)
+def test_failed_window_is_reported_and_refilled(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    api = get_api(server)
+
+    failed = data_collection.update_data(PAIR, GRANULARITY, FROM_DATE, TO_DATE, api)
+
+    assert failed == [(PAIR, GRANULARITY, window_start(1), window_start(2))]
+    stored = candle_store.read_candles(PAIR, GRANULARITY)
+    missing = (stored['time'] >= window_start(1)) & (stored['time'] < window_start(2))
+    assert len(stored) > 0 and not missing.any()
+
+    # the next run finds the hole as an interior gap and fetches it
+    assert data_collection.update_data(PAIR, GRANULARITY, FROM_DATE, TO_DATE, api) == []
+    stored = candle_store.read_candles(PAIR, GRANULARITY)
+    series = server.candles.get_series(PAIR, GRANULARITY)
+    expected = series[(series['time'] >= candle_store.to_utc(FROM_DATE)) & (series['time'] < candle_store.to_utc(TO_DATE))]
+    assert stored['time'].tolist() == expected['time'].tolist()
@@ -0,0 +1,60 @@
+import threading
+import datetime as dt
+import pytest
+from api.oanda_api import OandaApi
+from api.rate_limiter import TokenBucket
+from infrastructure import downloader
+
+@pytest.mark.parametrize('server', [[429, 503]], indirect=True)
+def test_retries_until_success(server):
+    api = OandaApi(base_url=server.base_url, max_retries=3, backoff_base=0.01)
+    candles = api.fetch_candles('EUR_USD', count=5, granularity='H1')
+
+    assert len(candles) == 5
+    assert server.statuses() == [429, 503, 200]
+
+@pytest.mark.parametrize('server', [[500, 502, 504, 500]], indirect=True)
+def test_gives_up_after_max_retries(server):
+    api = OandaApi(base_url=server.base_url, max_retries=2, backoff_base=0.01)
+
+    assert api.fetch_candles('EUR_USD', count=5, granularity='H1') is None
+    # the first attempt plus max_retries
+    assert server.statuses() == [500, 502, 504]
+
+@pytest.mark.parametrize('server', [[400]], indirect=True)
+def test_does_not_retry_client_errors(server):
+    api = OandaApi(base_url=server.base_url, max_retries=3, backoff_base=0.01)
+
+    assert api.fetch_candles('EUR_USD', count=5, granularity='H1') is None
+    assert server.statuses() == [400]
+
+def test_rate_is_enforced_across_threads(server):
+    rate = 20
+    requests = 21
+    api = OandaApi(base_url=server.base_url, pool_size=8, rate_limiter=TokenBucket(rate, capacity=1))
+    threads = [threading.Thread(target=api.fetch_candles, args=('EUR_USD', 1, 'H1')) for _ in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    times = sorted(t for t, _ in server.requests)
+    assert len(times) == requests
+    # one token up front, then one every 1 / rate seconds
+    assert times[-1] - times[0] >= (requests - 1) / rate * 0.9
+    for i in range(rate, len(times)):
+        assert times[i] - times[i - rate] >= 0.9
+
+@pytest.mark.parametrize('server', [[429, 503, 429]], indirect=True)
+def test_download_retries_failed_windows(server):
+    api = OandaApi(base_url=server.base_url, pool_size=4, rate_limiter=TokenBucket(50), max_retries=3, backoff_base=0.01)
+    start = dt.datetime(2015, 1, 5, tzinfo=dt.timezone.utc)
+    end = start + dt.timedelta(minutes=downloader.INCREMENTS['H1'] * 3)
+    results, failed = downloader.download(api, [('EUR_USD', 'H1', start, end)], workers=4)
+
+    assert failed == []
+    assert server.statuses().count(200) == 3
+    assert len(server.requests) == 6
+    df = results[('EUR_USD', 'H1')]
+    assert len(df) > 0
+    assert df['time'].is_monotonic_increasing and df['time'].is_unique
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from backtesting import backtesting
+from backtesting import engine
+from backtesting import fills
+from infrastructure import synthetic
+
+PAIR = 'EUR_USD'
+
+def flat_arrays(rows=18, price=1.1):
+    bid_c = np.full(rows, price)
+    return dict(
+        bid_o=bid_c.copy(),
+        bid_h=bid_c + 0.001,
+        bid_l=bid_c - 0.001,
+        bid_c=bid_c,
+        ask_c=bid_c + 0.0001
+    )
+
+def mid_ledger(trades):
+    # the columns apply_fills reads, mid exits are not used once the exits are repriced
+    entry_idx, stop_loss, take_profit = zip(*trades)
+    return pd.DataFrame(dict(
+        entry_idx=np.array(entry_idx, dtype=np.int64),
+        exit_idx=np.array(entry_idx, dtype=np.int64) + 1,
+        entry_price=1.1,
+        stop_loss=np.array(stop_loss),
+        take_profit=np.array(take_profit),
+        pips=-10.0,
+        bars_held=1,
+        closed=True
+    ))
+
+def test_drops_entries_overlapping_a_repriced_exit():
+    arrays = flat_arrays()
+    # the bid only reaches the first trade's stop on row 10
+    arrays['bid_l'][10] = 1.094
+    ledger = mid_ledger([
+        (1, 1.095, 1.105),
+        # enters while the first trade is still open on bid prices
+        (6, 1.09, 1.11),
+        # never stopped out, so the entry after it is dropped as well
+        (12, 1.09, 1.12),
+        (15, 1.09, 1.12)
+    ])
+
+    filled = fills.apply_fills(ledger, arrays, PAIR)
+
+    assert filled['entry_idx'].tolist() == [1, 12]
+    assert filled['exit_idx'].tolist() == [10, -1]
+    assert filled.attrs['dropped_overlaps'] == 2
+    assert engine.summarize_ledger(filled)['dropped_overlaps'] == 2
+
+def test_exit_on_the_bar_before_the_next_entry_is_kept():
+    arrays = flat_arrays()
+    arrays['bid_l'][5] = 1.094
+    ledger = mid_ledger([(1, 1.095, 1.105), (6, 1.09, 1.11)])
+
+    filled = fills.apply_fills(ledger, arrays, PAIR)
+
+    assert filled['entry_idx'].tolist() == [1, 6]
+    assert filled.attrs['dropped_overlaps'] == 0
+
+def test_repriced_ledger_never_overlaps():
+    df = synthetic.generate_candles(20000, 'M15', PAIR, seed=2)
+    backtesting.apply_technicals(df, PAIR, cache=False)
+    df.reset_index(drop=True, inplace=True)
+    arrays = engine.get_arrays(df)
+    arrays.update(fills.get_arrays(df))
+
+    ledger, summary = engine.run_ledger(arrays, PAIR, backtesting.DEFAULT_CONFIG, engine.get_times(df), fills.DEFAULT_FILLS)
+    mid, _ = engine.run_ledger(arrays, PAIR, backtesting.DEFAULT_CONFIG, engine.get_times(df))
+
+    assert len(ledger) > 0
+    assert summary['trades'] + summary['dropped_overlaps'] == len(mid)
+    exit_idx = ledger['exit_idx'].to_numpy()
+    assert (exit_idx[:-1] >= 0).all()
+    assert (ledger['entry_idx'].to_numpy()[1:] > exit_idx[:-1]).all()
@@ -0,0 +1,95 @@
+import asyncio
+import math
+import pytest
+import pandas as pd
+from backtesting import backtesting
+from backtesting import engine
+from infrastructure import live_trading
+from infrastructure import synthetic
+
+PAIR = 'EUR_USD'
+GRANULARITY = 'H1'
+ROWS = 10000
+# first restart point, the runner is flat and has no saved trades before it
+FIRST_STOP = 2000
+
+def as_value(value):
+    # the batch arrays use NaN where the state machine returns None
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+@pytest.mark.parametrize('pair', ['EUR_USD', 'USD_JPY'])
+def test_pair_state_machine_matches_engine(pair):
+    df = synthetic.generate_candles(6000, GRANULARITY, pair, seed=1)
+    backtesting.apply_technicals(df, pair, cache=False)
+    df.reset_index(drop=True, inplace=True)
+    config = backtesting.DEFAULT_CONFIG
+    stage, trade, entry_price, stop_loss, take_profit, pips = engine.run_arrays(engine.get_arrays(df), pair, config)[:6]
+
+    machine = engine.PairStateMachine(pair, config)
+    columns = ['mid_h', 'mid_l', 'mid_c', 'is_bottom', 'in_downtrend', 'strong_bullish']
+    for i, candle in enumerate(df[columns].to_dict('records')):
+        row = machine.step(candle, candle)
+        expected = dict(
+            stage=engine.STAGE_LABELS[stage[i]],
+            trade=engine.TRADE_LABELS[trade[i]],
+            entry_price=as_value(entry_price[i]),
+            stop_loss=as_value(stop_loss[i]),
+            take_profit=as_value(take_profit[i]),
+            pips=as_value(pips[i])
+        )
+        assert {k: as_value(v) for k, v in row.items()} == pytest.approx(expected, nan_ok=True), f"row {i}"
+    assert (trade == engine.TRADE_OPENED).sum() > 0
+
+def get_api(rows):
+    api = synthetic.SyntheticApi(rows=ROWS, seed=1)
+    api.series[(PAIR, GRANULARITY)] = api.get_series(PAIR, GRANULARITY).iloc[:rows]
+    return api
+
+def get_runner(rows, state_file, history=ROWS):
+    broker = live_trading.SimulatedBroker()
+    runner = live_trading.LiveRunner(get_api(rows), [PAIR], GRANULARITY, broker, state_file=state_file, history=history)
+    saved = runner.load_state()
+    asyncio.run(runner.start_pair(PAIR, saved))
+    return runner
+
+# the second case is down for far longer than its warm-up history
+@pytest.mark.parametrize('history, min_gap', [(ROWS, 0), (300, 1000)])
+def test_restart_replays_without_orders(tmp_path, history, min_gap):
+    candles = synthetic.SyntheticApi(rows=ROWS, seed=1).get_series(PAIR, GRANULARITY)
+    records = candles[['time', 'mid_o', 'mid_h', 'mid_l', 'mid_c']].to_dict('records')
+
+    # reference: up at FIRST_STOP and trading every candle after it
+    reference = get_runner(FIRST_STOP, str(tmp_path / 'reference.json'), history)
+    states = {}
+    for i in range(FIRST_STOP, ROWS):
+        reference.process_candle(PAIR, records[i])
+        states[i + 1] = reference.machines[PAIR].get_state()
+    opens = [int(candles['time'].searchsorted(o['time'])) for o in reference.broker.orders if o['action'] == 'open']
+    opens = [i for i in opens if i >= FIRST_STOP + min_gap]
+    assert len(opens) > 1
+
+    # restart just after a trade opened, so the replay opens it and it is still running
+    restart = opens[0] + 1
+    state_file = str(tmp_path / 'live_state.json')
+    get_runner(FIRST_STOP, state_file, history).save_state()
+    runner = get_runner(restart, state_file, history)
+    assert runner.broker.orders == []
+    assert runner.machines[PAIR].get_state() == states[restart]
+    assert PAIR in runner.unsent
+
+    # after the restart only trades opened live reach the broker
+    for i in range(restart, ROWS):
+        runner.process_candle(PAIR, records[i])
+    assert runner.machines[PAIR].get_state() == reference.machines[PAIR].get_state()
+    later = [o for o in reference.broker.orders if o['time'] > records[restart - 1]['time']]
+    first_open = next(k for k, o in enumerate(later) if o['action'] == 'open')
+    assert first_open > 0
+    assert runner.broker.orders == later[first_open:]
+
+def test_broker_requires_every_method():
+    class OpenOnly(live_trading.Broker):
+        def open_trade(self, pair, time, entry_price, stop_loss, take_profit):
+            pass
+
+    with pytest.raises(TypeError):
+        OpenOnly()
@@ -0,0 +1,23 @@
+import math
+import numpy as np
+import pandas as pd
+from backtesting import metrics
+
+def test_equity_metrics_on_daily_returns():
+    equity = pd.DataFrame({
+        'time': pd.to_datetime(['2020-01-01 10:00', '2020-01-01 12:00', '2020-01-03 09:00', '2020-01-06 00:00'], utc=True),
+        'equity': [10100.0, 10050.0, 10200.0, 10150.0]
+    })
+    result = metrics.equity_metrics(equity, 10000.0)
+
+    # one return per calendar day from jan 1 to jan 6, the last event of a day counts
+    returns = np.array([10050 / 10000 - 1, 0.0, 10200 / 10050 - 1, 0.0, 0.0, 10150 / 10200 - 1])
+    assert result['periods'] == 6
+    assert math.isclose(result['sharpe'], returns.mean() / returns.std(ddof=1) * math.sqrt(365))
+    assert math.isclose(result['sortino'], returns.mean() / math.sqrt(np.mean(np.minimum(returns, 0.0)**2)) * math.sqrt(365))
+
+def test_equity_metrics_need_two_periods():
+    equity = pd.DataFrame({'time': pd.to_datetime(['2020-01-01'], utc=True), 'equity': [10100.0]})
+
+    assert math.isnan(metrics.equity_metrics(equity, 10000.0)['sharpe'])
+    assert metrics.equity_metrics(equity.iloc[:0])['periods'] == 0
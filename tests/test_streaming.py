@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from backtesting import backtesting
+from infrastructure import synthetic
+from technicals import streaming
+
+COLUMNS = ['in_downtrend', 'is_bottom', 'strong_bullish']
+
+def stream(df, config):
+    # TechnicalsEngine output per candle, None for the warm-up rows apply_technicals drops
+    engine = streaming.TechnicalsEngine.from_config(config)
+    return [engine.update(candle) for candle in df[['mid_o', 'mid_h', 'mid_l', 'mid_c']].to_dict('records')]
+
+@pytest.mark.parametrize('rows, granularity, pair, seed', [
+    (200_000, 'M5', 'EUR_USD', 4),
+    (20_000, 'H1', 'USD_JPY', 1),
+    (20_000, 'H4', 'GBP_USD', 2)
+])
+def test_streaming_matches_batch_technicals(rows, granularity, pair, seed):
+    candles = synthetic.generate_candles(rows, granularity, pair, seed=seed)
+    config = backtesting.DEFAULT_CONFIG
+    live = stream(candles, config)
+
+    batch = candles.copy()
+    backtesting.apply_technicals(batch, pair, config, cache=False)
+    warm_up = [i for i, row in enumerate(live) if row is None]
+    assert warm_up == list(range(len(candles) - len(batch)))
+    assert batch.index.tolist() == list(range(len(warm_up), len(candles)))
+
+    for col in COLUMNS:
+        streamed = np.array([row[col] for row in live[len(warm_up):]], dtype=np.bool_)
+        mismatched = np.flatnonzero(streamed != batch[col].to_numpy(dtype=np.bool_))
+        assert len(mismatched) == 0, f"{col} differs on rows {batch.index[mismatched[:10]].tolist()}"
+    assert batch['in_downtrend'].any() and batch['is_bottom'].any() and batch['strong_bullish'].any()
+
+@pytest.mark.parametrize('window', [1, 10, 150])
+def test_rolling_mean_matches_pandas(window):
+    closes = synthetic.generate_candles(20_000, 'M5', 'EUR_USD', seed=3)['mid_c']
+    # a flat stretch exercises pandas' identical-values rule
+    closes.iloc[5000:5400] = closes.iloc[5000]
+    rolling = streaming.RollingMean(window)
+    streamed = np.array([rolling.update(v) for v in closes.tolist()])
+
+    np.testing.assert_array_equal(streamed, closes.rolling(window).mean().to_numpy())